@@ -0,0 +1,105 @@
+import argparse
+import random
+from datetime import date, timedelta
+
+
+PRODUCT_NAMES = [
+    "Laptop", "Laptop,Premium", "Mouse", "Mouse,Wireless", "Keyboard",
+    "Keyboard,Mechanical", "Monitor", "Monitor,LED", "Webcam", "Webcam,HD",
+    "Headphones", "USB Cable", "External Hard Drive,1TB", "Wireless Mouse",
+    "Wireless Mouse,Gaming", "Laptop Charger", "Laptop Charger,65W"
+]
+
+REGIONS = ["North", "South", "East", "West"]
+
+HEADER = "TransactionID|Date|ProductID|ProductName|Quantity|UnitPrice|CustomerID|Region"
+
+
+def _dirty(fields, rng):
+    """
+    Breaks a valid row the same ways the sample data is broken
+    """
+
+    kind = rng.randrange(6)
+    if kind == 0:
+        fields[0] = "X" + fields[0][1:]      # bad TransactionID
+    elif kind == 1:
+        fields[4] = "0"                      # zero quantity
+    elif kind == 2:
+        fields[5] = "-" + fields[5]          # negative price
+    elif kind == 3:
+        fields[6] = ""                       # missing CustomerID
+    elif kind == 4:
+        fields[7] = ""                       # missing Region
+    else:
+        fields = fields[:6]                  # truncated row
+    return fields
+
+
+def generate_rows(rows, products=10, customers=25, regions=4, dirty_ratio=0.12,
+                  comma_price_ratio=0.1, days=30, seed=42):
+    """
+    Yields pipe-delimited sales lines (without trailing newlines),
+    starting with the header
+    """
+
+    rng = random.Random(seed)
+    catalog = [
+        (f"P{101 + i}", PRODUCT_NAMES[i % len(PRODUCT_NAMES)], rng.randint(100, 90000))
+        for i in range(products)
+    ]
+    region_names = [REGIONS[i] if i < len(REGIONS) else f"Region{i}" for i in range(regions)]
+    dates = [(date(2024, 1, 1) + timedelta(days=d)).isoformat() for d in range(days)]
+
+    yield HEADER
+
+    for i in range(rows):
+        product_id, name, base_price = rng.choice(catalog)
+        price = max(1, int(base_price * rng.uniform(0.7, 1.3)))
+        price_text = f"{price:,}" if price >= 1000 and rng.random() < comma_price_ratio else str(price)
+
+        fields = [
+            f"T{i + 1:03d}",
+            rng.choice(dates),
+            product_id,
+            name,
+            str(rng.randint(1, 10)),
+            price_text,
+            f"C{rng.randint(1, customers):03d}",
+            rng.choice(region_names)
+        ]
+
+        if rng.random() < dirty_ratio:
+            fields = _dirty(fields, rng)
+
+        yield "|".join(fields)
+
+
+def write_sales_file(file_path, rows, **options):
+    with open(file_path, "w", encoding="latin-1") as f:
+        for line in generate_rows(rows, **options):
+            f.write(line + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic sales data file")
+    parser.add_argument("output", help="file to write")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=10)
+    parser.add_argument("--customers", type=int, default=25)
+    parser.add_argument("--regions", type=int, default=4)
+    parser.add_argument("--dirty-ratio", type=float, default=0.12)
+    parser.add_argument("--comma-price-ratio", type=float, default=0.1)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    write_sales_file(
+        args.output, args.rows, products=args.products, customers=args.customers,
+        regions=args.regions, dirty_ratio=args.dirty_ratio,
+        comma_price_ratio=args.comma_price_ratio, days=args.days, seed=args.seed
+    )
+
+
+if __name__ == "__main__":
+    main()
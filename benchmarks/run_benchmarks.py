@@ -0,0 +1,268 @@
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.generate_sales_data import write_sales_file
+from utils.file_handler import read_sales_file
+from utils import data_processor
+from utils.aggregator import aggregate_transactions
+from utils.columnar import table_from_transactions, new_table, extend_table
+from utils.line_parser import iter_table_batches
+from utils.report_generator import generate_sales_report, REPORT_FORMATS
+from utils.vectorized import np
+
+
+ANALYTICS = [
+    "calculate_total_revenue",
+    "region_wise_sales",
+    "top_selling_products",
+    "customer_analysis",
+    "daily_sales_trend",
+    "find_peak_sales_day",
+    "low_performing_products",
+]
+
+# Entry points whose import time is checked, and dependencies they must
+# not load just by being imported
+STARTUP_MODULES = ["main", "utils.data_processor", "utils.file_handler", "utils.report_generator"]
+DEFERRED_IMPORTS = ["requests", "numpy", "sqlite3", "asyncio"]
+# Commands that only parse arguments; besides the time their imports add
+# to interpreter startup, they must not load any project module but these
+STARTUP_COMMANDS = [["main.py", "--help"]]
+CLI_MODULES = ["utils", "utils.report_formats"]
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NUMPY_ANALYTICS = [
+    "calculate_total_revenue",
+    "region_wise_sales",
+    "top_selling_products",
+    "find_peak_sales_day",
+    "low_performing_products",
+]
+
+
+def measure(func, measure_memory=True):
+    """
+    Runs func once for wall time and, optionally, once more under
+    tracemalloc for peak allocated memory
+
+    Returns: (result, seconds, peak_bytes or None)
+    """
+
+    # The library functions print progress; keep the benchmark output clean
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+
+        peak = None
+        if measure_memory:
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return result, seconds, peak
+
+
+def benchmark_size(rows, work_dir, measure_memory=True):
+    data_file = os.path.join(work_dir, f"sales_{rows}.txt")
+    if not os.path.exists(data_file):
+        write_sales_file(data_file, rows)
+
+    results = []
+
+    def record(stage, func):
+        result, seconds, peak = measure(func, measure_memory)
+        results.append({
+            "rows": rows,
+            "stage": stage,
+            "seconds": round(seconds, 6),
+            "rows_per_sec": round(rows / seconds) if seconds else None,
+            "peak_mb": round(peak / 1024 / 1024, 2) if peak is not None else None
+        })
+        return result
+
+    gz_file = data_file + ".gz"
+    if not os.path.exists(gz_file):
+        with open(data_file, "rb") as src, gzip.open(gz_file, "wb") as dst:
+            dst.write(src.read())
+
+    record("read_sales_file[gz]", lambda: read_sales_file(gz_file))
+    lines = record("read_sales_file", lambda: read_sales_file(data_file))
+    transactions = record("clean_and_validate_data", lambda: data_processor.clean_and_validate_data(lines))
+    del lines
+
+    def parse_file():
+        table = new_table()
+        for batch in iter_table_batches(data_file):
+            extend_table(table, batch)
+        return table
+
+    record("iter_table_batches", parse_file)
+
+    for name in ANALYTICS:
+        func = getattr(data_processor, name)
+        record(name, lambda: func(transactions))
+
+    aggregates = record("aggregate_transactions", lambda: aggregate_transactions(transactions))
+
+    if np is not None:
+        table = record("table_from_transactions", lambda: table_from_transactions(transactions))
+        for name in NUMPY_ANALYTICS:
+            func = getattr(data_processor, name)
+            record(f"{name}[numpy]", lambda: func(table, backend="numpy"))
+
+    report_file = os.path.join(work_dir, "sales_report.txt")
+    record("generate_sales_report", lambda: generate_sales_report(transactions, {}, report_file))
+    record(
+        "generate_sales_report[aggregates]",
+        lambda: generate_sales_report(None, {}, report_file, aggregates=aggregates)
+    )
+    record(
+        "generate_sales_report[all formats]",
+        lambda: generate_sales_report(None, {}, report_file, aggregates=aggregates, formats=REPORT_FORMATS)
+    )
+
+    return results
+
+
+def measure_import(module):
+    """
+    Imports module in a fresh interpreter under -X importtime
+
+    Returns: (cumulative import milliseconds, deferred dependencies loaded)
+    """
+
+    cumulative, _ = _import_times(["-c", f"import {module}"])
+    loaded = [name for name in DEFERRED_IMPORTS if name in cumulative]
+    return cumulative[module] / 1000, loaded
+
+
+def _import_times(argv):
+    """
+    Runs the interpreter with argv under -X importtime
+
+    Returns: (dict of module -> cumulative microseconds, list of the
+    modules imported at top level, in order)
+    """
+
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime"] + argv,
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+
+    cumulative = {}
+    top_level = []
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nested
+        # imports are indented under the package that triggered them
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, total, name = line.split("|")
+        cumulative[name.strip()] = int(total)
+        if not name.startswith("  "):
+            top_level.append(name.strip())
+
+    return cumulative, top_level
+
+
+def measure_command(argv):
+    """
+    Runs a command (e.g. main.py --help) in a fresh interpreter
+
+    Returns: (milliseconds its imports add to a bare interpreter's
+    startup, deferred dependencies and project modules it should not load)
+    """
+
+    _, baseline = _import_times(["-c", "pass"])
+    cumulative, top_level = _import_times(argv)
+
+    ms = sum(cumulative[name] for name in top_level if name not in baseline) / 1000
+    loaded = [name for name in DEFERRED_IMPORTS if name in cumulative]
+    loaded += [
+        name for name in cumulative
+        if name.split(".")[0] == "utils" and name not in CLI_MODULES
+    ]
+    return ms, loaded
+
+
+def check_startup(budget_ms):
+    """
+    Prints the import time of each entry point and startup command and
+    flags any over the budget or pulling in a dependency that should load
+    lazily
+
+    Returns: True if every module passed
+    """
+
+    ok = True
+    print(f"{'Module':<30}{'Import ms':>12}  Deferred deps loaded")
+    for module in STARTUP_MODULES:
+        ms, loaded = measure_import(module)
+        failed = ms > budget_ms or bool(loaded)
+        ok = ok and not failed
+        print(f"{module:<30}{ms:>12.1f}  {', '.join(loaded) or '-'}{'  FAIL' if failed else ''}")
+
+    for argv in STARTUP_COMMANDS:
+        ms, loaded = measure_command(argv)
+        failed = ms > budget_ms or bool(loaded)
+        ok = ok and not failed
+        print(f"{' '.join(argv):<30}{ms:>12.1f}  {', '.join(loaded) or '-'}{'  FAIL' if failed else ''}")
+
+    return ok
+
+
+def print_results(results):
+    print(f"{'Rows':>10}  {'Stage':<40}{'Seconds':>10}{'Rows/sec':>14}{'Peak MB':>10}")
+    for r in results:
+        rate = f"{r['rows_per_sec']:,}" if r["rows_per_sec"] else "-"
+        peak = f"{r['peak_mb']:.2f}" if r["peak_mb"] is not None else "-"
+        print(f"{r['rows']:>10,}  {r['stage']:<40}{r['seconds']:>10.4f}{rate:>14}{peak:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sales analytics pipeline")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000],
+                        help="dataset sizes, e.g. --rows 10000 1000000 10000000")
+    parser.add_argument("--work-dir", help="where generated files are kept (default: temp dir)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--json", help="also write results to this JSON file")
+    parser.add_argument("--imports", action="store_true",
+                        help="only run the startup import-time check")
+    parser.add_argument("--import-budget-ms", type=float, default=50.0,
+                        help="maximum import time per entry point (default: 50)")
+    args = parser.parse_args()
+
+    startup_ok = check_startup(args.import_budget_ms)
+    if args.imports:
+        sys.exit(0 if startup_ok else 1)
+    print()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="sales_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+
+    results = []
+    for rows in args.rows:
+        results.extend(benchmark_size(rows, work_dir, not args.no_memory))
+
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if not startup_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,88 +1,330 @@
-<<<<<<< HEAD
-from utils.file_handler import read_sales_file
-from utils.data_processor import clean_and_validate_data
-from utils.api_handler import fetch_all_products, create_product_mapping
-from utils.report_generator import generate_sales_report
+import argparse
+import os
+import sys
 
+# Modules are imported inside each mode so a run only loads what it uses
+# (e.g. --serve never loads the batch pool, offline runs skip the HTTP stack
+# while the product cache is fresh); see benchmarks.run_benchmarks --imports
 
-def main():
+
+def _read_amount(prompt):
+    """
+    Asks for an amount until the answer is a number or blank
+
+    Returns: float, or None when left blank
+    """
+    while True:
+        value = input(prompt).strip()
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            print(f"❌ Invalid amount: {value!r}, enter a number or leave blank")
+
+
+def main(formats=('text',)):
+    from utils.file_handler import write_enriched_data
+    from utils.line_parser import iter_table_batches
+    from utils.aggregator import new_aggregates, update_aggregates
+    from utils.columnar import iter_table_rows
+    from utils.dedup import new_deduper, dedup_table, replay_dedup_table
+    from utils.api_handler import (
+        fetch_all_products, create_product_mapping, iter_enriched_records, lookup_products
+    )
+    from utils.report_generator import generate_sales_report
+    from utils.instrumentation import start_run, finish_run, stage
+
+    data_file = "data/sales_data.txt"
+    run_summary = start_run()
     try:
         print("=" * 40)
         print("SALES ANALYTICS SYSTEM")
         print("=" * 40)
 
         print("\n[1/10] Reading sales data...")
-        lines = read_sales_file("data/sales_data.txt")
-        print(f"✓ Successfully read {len(lines)} transactions")
+        stats = {"duplicates": 0}
+        batches = iter_table_batches(data_file, stats=stats)
+        print(f"✓ Streaming {data_file}")
 
         print("\n[2/10] Parsing and cleaning data...")
-        valid_data = clean_and_validate_data(lines)
-        print(f"✓ Parsed {len(valid_data)} records")
+        aggregates = new_aggregates()
+        deduper = new_deduper()
+        dropped_ids = set()
+
+        # Batches are only folded into the aggregates, never kept, so
+        # memory stays flat however large the file is
+        with stage("read_and_clean") as record:
+            for batch in batches:
+                batch = dedup_table(deduper, batch, stats, dropped=dropped_ids)
+                update_aggregates(aggregates, batch)
+            record["rows"] = stats["total"]
+        # The enrichment pass only needs the duplicated IDs
+        deduper = None
 
-        regions = sorted(set(t["Region"] for t in valid_data))
-        amounts = [t["Quantity"] * t["UnitPrice"] for t in valid_data]
+        print(f"✓ Successfully read {stats['total']} transactions")
+        print(f"✓ Parsed {aggregates['transaction_count']} records")
 
         print("\n[3/10] Filter Options Available:")
-        print(f"Regions: {', '.join(regions)}")
-        print(f"Amount Range: ₹{min(amounts):,.0f} - ₹{max(amounts):,.0f}")
+        print(f"Regions: {', '.join(sorted(aggregates['regions']))}")
+        print(f"Amount Range: ₹{aggregates['min_amount']:,.0f} - ₹{aggregates['max_amount']:,.0f}")
 
+        filters = None
         choice = input("Do you want to filter data? (y/n): ").lower()
         if choice == "y":
-            print("Filtering not applied (optional feature skipped)")
+            region = input("Region (blank for all): ").strip() or None
+            min_amount = _read_amount("Minimum amount (blank for none): ")
+            max_amount = _read_amount("Maximum amount (blank for none): ")
+            start_date = input("From date YYYY-MM-DD (blank for none): ").strip() or None
+            end_date = input("To date YYYY-MM-DD (blank for none): ").strip() or None
+
+            filters = {
+                "region": region,
+                "min_amount": min_amount,
+                "max_amount": max_amount,
+                "start_date": start_date,
+                "end_date": end_date
+            }
+            # The filtered aggregates are rebuilt by the enrichment pass
+            aggregates = new_aggregates()
 
         print("\n[4/10] Validating transactions...")
-        print(f"✓ Valid: {len(valid_data)} | Invalid: {len(lines) - len(valid_data)}")
+        print(
+            f"✓ Valid: {stats['total'] - stats['invalid'] - stats['duplicates']} | "
+            f"Invalid: {stats['invalid']} | Duplicates: {stats['duplicates']}"
+        )
 
         print("\n[5/10] Analyzing sales data...")
         print("✓ Analysis complete")
 
         print("\n[6/10] Fetching product data from API...")
-        products = fetch_all_products()
-        product_map = create_product_mapping(products)
+        with stage("fetch_products") as record:
+            products = fetch_all_products()
+            product_map = create_product_mapping(products)
+            record["rows"] = len(products)
         print(f"✓ Fetched {len(products)} products")
 
+        def clean_rows():
+            # Second streaming pass over the file: each batch is
+            # de-duplicated and filtered on its own, then dropped
+            from utils.query import filter_table
+
+            seen = set()
+            for batch in iter_table_batches(data_file):
+                batch = replay_dedup_table(batch, dropped_ids, seen)
+                if filters:
+                    batch = filter_table(batch, **filters)
+                    update_aggregates(aggregates, batch)
+                yield from iter_table_rows(batch)
+
         print("\n[7/10] Enriching sales data...")
-        print(f"✓ Enriched {len(valid_data)}/{len(valid_data)} transactions (100%)")
+        enrich_stats = {}
+        # Records are enriched one at a time and streamed straight into the
+        # columnar file, so the enriched rows are never all held in memory
+        with stage("enrich") as record:
+            write_enriched_data(
+                iter_enriched_records(clean_rows(), product_map, stats=enrich_stats),
+                "data/enriched_sales_data.bin"
+            )
+            record["rows"] = enrich_stats["total"]
+        matched = enrich_stats["matched"]
+        total = enrich_stats["total"]
+        if filters:
+            print(f"✓ {total} transactions match the filters")
+        print(
+            f"✓ Enriched {matched}/{total} transactions "
+            f"({(matched / total * 100) if total else 0:.0f}%) "
+            f"with {enrich_stats['lookups']} product lookups"
+        )
 
         print("\n[8/10] Saving enriched data...")
+        print("✓ Saved to: data/enriched_sales_data.bin")
 
-        with open("data/enriched_sales_data.txt", "w", encoding="utf-8") as f:
-            for txn in valid_data:
-                f.write(str(txn) + "\n")
+        print("\n[9/10] Generating report...")
+        with stage("report", rows=aggregates["transaction_count"]):
+            product_info = lookup_products(sorted(aggregates["product_ids"]), product_map)
+            enriched_products = {pid: info for pid, info in product_info.items() if info}
+            paths = generate_sales_report(
+                None, enriched_products, aggregates=aggregates, formats=formats
+            )
+        print(f"✓ Report saved to: {', '.join(paths.values())}")
 
-        print("✓ Saved to: data/enriched_sales_data.txt")
+        print("\n[10/10] Process Complete!")
+        print("=" * 40)
 
+    except Exception as e:
+        print("\n❌ An error occurred:")
+        print(str(e))
 
-        print("\n[9/10] Generating report...")
-        generate_sales_report(valid_data, product_map)
-        print("✓ Report saved to: output/sales_report.txt")
+    finally:
+        finish_run(run_summary, "output/run_summary.json")
+        print("Run summary saved to: output/run_summary.json")
 
-        print("\n[10/10] Process Complete!")
+
+def main_incremental():
+    """
+    Updates the report with only the rows appended since the last run
+    """
+    from utils.api_handler import fetch_all_products, create_product_mapping
+    from utils.incremental import run_incremental
+
+    try:
         print("=" * 40)
+        print("SALES ANALYTICS SYSTEM (INCREMENTAL)")
+        print("=" * 40)
+
+        print("\n[1/2] Fetching product data from API...")
+        product_map = create_product_mapping(fetch_all_products())
+
+        print("\n[2/2] Ingesting new transactions...")
+        stats = run_incremental("data/sales_data.txt", "output/aggregate_state.json", product_map)
+        print(
+            f"✓ New: {stats['new']} | Invalid: {stats['invalid']} | "
+            f"Duplicates: {stats['duplicates']}"
+        )
+        print("✓ Report saved to: output/sales_report.txt")
 
     except Exception as e:
         print("\n❌ An error occurred:")
         print(str(e))
 
 
-if __name__ == "__main__":
-    main()
-=======
-# main.py
+def main_batch(args):
+    """
+    Non-interactive run over many files: one report per file plus a
+    combined report
 
-from utils.file_handler import read_sales_file
-from utils.data_processor import clean_and_validate_data
+    Returns: exit status (1 if any file failed)
+    """
+    from utils.api_handler import fetch_all_products, create_product_mapping
+    from utils.batch import run_batch
 
-def main():
-    file_path = "data/sales_data.txt"
+    print("=" * 40)
+    print("SALES ANALYTICS SYSTEM (BATCH)")
+    print("=" * 40)
 
-    lines = read_sales_file(file_path)
-    valid_data = clean_and_validate_data(lines)
+    print("\n[1/2] Fetching product data from API...")
+    product_map = create_product_mapping(fetch_all_products())
 
-    # Later you can add analytics here
-    # For now, cleaning is enough
+    print("\n[2/2] Processing files...")
+    results = run_batch(
+        args.inputs,
+        output_dir=args.output_dir,
+        filters={
+            "region": args.region,
+            "min_amount": args.min_amount,
+            "max_amount": args.max_amount,
+            "start_date": args.start_date,
+            "end_date": args.end_date
+        },
+        workers=args.workers,
+        product_map=product_map,
+        formats=args.formats
+    )
 
-if __name__ == "__main__":
-    main()
+    failed = sum(1 for result in results if result["error"])
+    print(f"\n✓ {len(results) - failed} file(s) processed, {failed} failed")
+    return 1 if failed or not results else 0
+
+
+def main_sqlite(args):
+    """
+    Loads the inputs into a SQLite store and reports on everything stored
+    so far, with the group-bys done in SQL
+    """
+    from utils.api_handler import fetch_all_products, create_product_mapping, lookup_products
+    from utils.report_generator import generate_sales_report
+    from utils.sqlite_store import open_store, load_file, sql_aggregates
+
+    try:
+        print("=" * 40)
+        print("SALES ANALYTICS SYSTEM (SQLITE)")
+        print("=" * 40)
+
+        inputs = args.inputs or ["data/sales_data.txt"]
+        connection = open_store(args.db)
+
+        try:
+            print("\n[1/3] Loading transactions...")
+            stats = {}
+            inserted = load_file(connection, inputs, stats=stats)
+            print(f"✓ Read {stats['total']} | Invalid: {stats['invalid']} | New rows stored: {inserted}")
 
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
+            print("\n[2/3] Aggregating in SQL...")
+            # The report only lists the top 5 customers
+            aggregates = sql_aggregates(
+                connection,
+                top_customers=5,
+                region=args.region,
+                min_amount=args.min_amount,
+                max_amount=args.max_amount,
+                start_date=args.start_date,
+                end_date=args.end_date
+            )
+            print(f"✓ {aggregates['transaction_count']} transactions match")
+        finally:
+            connection.close()
+
+        print("\n[3/3] Generating report...")
+        product_map = create_product_mapping(fetch_all_products())
+        product_info = lookup_products(sorted(aggregates["product_ids"]), product_map)
+        enriched_products = {pid: info for pid, info in product_info.items() if info}
+        os.makedirs(args.output_dir, exist_ok=True)
+        output_file = os.path.join(args.output_dir, "sales_report.txt")
+        paths = generate_sales_report(
+            None, enriched_products, output_file, aggregates=aggregates, formats=args.formats
+        )
+        print(f"✓ Report saved to: {', '.join(paths.values())}")
+
+    except Exception as e:
+        print("\n❌ An error occurred:")
+        print(str(e))
+
+
+def parse_args(argv=None):
+    from utils.report_formats import REPORT_FORMATS
+
+    parser = argparse.ArgumentParser(
+        description="Sales analytics: interactive run, batch reports, incremental update or HTTP service"
+    )
+    parser.add_argument(
+        "inputs", nargs="*",
+        help="sales files or globs (e.g. 'data/2024-*.txt.gz'); runs in batch mode without prompts"
+    )
+    parser.add_argument("--region", help="only include this region")
+    parser.add_argument("--min-amount", type=float, help="minimum transaction amount")
+    parser.add_argument("--max-amount", type=float, help="maximum transaction amount")
+    parser.add_argument("--start-date", help="first date to include (YYYY-MM-DD)")
+    parser.add_argument("--end-date", help="last date to include (YYYY-MM-DD)")
+    parser.add_argument("--output-dir", default="output", help="where batch reports are written")
+    parser.add_argument(
+        "--format", dest="formats", nargs="+", choices=REPORT_FORMATS, default=["text"],
+        help="report formats to write (default: text)"
+    )
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="only ingest rows appended to data/sales_data.txt since the last run"
+    )
+    parser.add_argument(
+        "--db", help="SQLite store to load the inputs into and report from (SQL aggregation)"
+    )
+    parser.add_argument("--serve", action="store_true", help="serve the analytics over HTTP")
+    parser.add_argument("--host", help="service host (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, help="service port (default: 8000)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.incremental:
+        main_incremental()
+    elif args.serve:
+        from utils.service import run_service, DEFAULT_HOST, DEFAULT_PORT
+        run_service("data/sales_data.txt", args.host or DEFAULT_HOST, args.port or DEFAULT_PORT)
+    elif args.db:
+        main_sqlite(args)
+    elif args.inputs:
+        sys.exit(main_batch(args))
+    else:
+        main(args.formats)
@@ -0,0 +1,465 @@
+from utils.columnar import is_table
+from utils.sketches import (
+    new_distinct, hll_add, distinct_update, distinct_merge,
+    distinct_to_json, distinct_from_json
+)
+from utils.topn import SPACE_SAVING_CAPACITY, space_saving_new, space_saving_update
+
+
+ALL_GROUPS = ('regions', 'products', 'customers', 'daily')
+
+
+def new_aggregates(groups=ALL_GROUPS, distinct='exact', error=0.01):
+    """
+    Creates an empty aggregate state
+
+    Only the requested group-bys are tracked; the overall totals,
+    amount range, date range and ProductIDs are always tracked.
+    With distinct='hll', unique customers per day and products per
+    customer use fixed-size HyperLogLog sketches (standard error `error`)
+    instead of sets.
+    """
+
+    new_distinct(distinct, error)  # validates the mode
+
+    aggregates = {
+        'total_revenue': 0.0,
+        'transaction_count': 0,
+        'min_amount': None,
+        'max_amount': None,
+        'min_date': None,
+        'max_date': None,
+        'product_ids': set(),
+        'distinct_mode': distinct,
+        'distinct_error': error
+    }
+
+    for group in groups:
+        aggregates[group] = {}
+
+    return aggregates
+
+
+def update_aggregates(aggregates, transactions):
+    """
+    Folds transactions into the aggregate state in a single pass
+
+    Can be called repeatedly, e.g. once per chunk of a streamed file.
+    transactions may also be a columnar table (see utils.columnar).
+    """
+
+    if is_table(transactions):
+        return update_aggregates_from_table(aggregates, transactions)
+
+    mode = aggregates.get('distinct_mode', 'exact')
+    error = aggregates.get('distinct_error')
+    exact = mode == 'exact'
+
+    regions = aggregates.get('regions')
+    products = aggregates.get('products')
+    customers = aggregates.get('customers')
+    daily = aggregates.get('daily')
+    product_ids = aggregates['product_ids']
+
+    total_revenue = aggregates['total_revenue']
+    count = aggregates['transaction_count']
+    min_amount = aggregates['min_amount']
+    max_amount = aggregates['max_amount']
+    min_date = aggregates['min_date']
+    max_date = aggregates['max_date']
+
+    for t in transactions:
+        qty = t['Quantity']
+        amount = qty * t['UnitPrice']
+        date = t['Date']
+
+        total_revenue += amount
+        count += 1
+
+        if min_amount is None or amount < min_amount:
+            min_amount = amount
+        if max_amount is None or amount > max_amount:
+            max_amount = amount
+        if min_date is None or date < min_date:
+            min_date = date
+        if max_date is None or date > max_date:
+            max_date = date
+
+        product_ids.add(t['ProductID'])
+
+        if regions is not None:
+            region = regions.get(t['Region'])
+            if region is None:
+                region = regions[t['Region']] = {
+                    'total_sales': 0.0,
+                    'transaction_count': 0
+                }
+            region['total_sales'] += amount
+            region['transaction_count'] += 1
+
+        if products is not None:
+            product = products.get(t['ProductName'])
+            if product is None:
+                product = products[t['ProductName']] = {
+                    'quantity': 0,
+                    'revenue': 0.0
+                }
+            product['quantity'] += qty
+            product['revenue'] += amount
+
+        if customers is not None:
+            customer = customers.get(t['CustomerID'])
+            if customer is None:
+                customer = customers[t['CustomerID']] = {
+                    'total_spent': 0.0,
+                    'purchase_count': 0,
+                    'products': new_distinct(mode, error)
+                }
+            customer['total_spent'] += amount
+            customer['purchase_count'] += 1
+            if exact:
+                customer['products'].add(t['ProductName'])
+            else:
+                hll_add(customer['products'], t['ProductName'])
+
+        if daily is not None:
+            day = daily.get(date)
+            if day is None:
+                day = daily[date] = {
+                    'revenue': 0.0,
+                    'transaction_count': 0,
+                    'customers': new_distinct(mode, error)
+                }
+            day['revenue'] += amount
+            day['transaction_count'] += 1
+            if exact:
+                day['customers'].add(t['CustomerID'])
+            else:
+                hll_add(day['customers'], t['CustomerID'])
+
+    aggregates['total_revenue'] = total_revenue
+    aggregates['transaction_count'] = count
+    aggregates['min_amount'] = min_amount
+    aggregates['max_amount'] = max_amount
+    aggregates['min_date'] = min_date
+    aggregates['max_date'] = max_date
+
+    return aggregates
+
+
+def update_aggregates_from_table(aggregates, table):
+    """
+    Folds a columnar table into the aggregate state
+
+    Groups are accumulated in flat lists indexed by the dictionary codes,
+    so the per-row work is integer indexing instead of dict lookups.
+    """
+
+    columns = table['columns']
+    quantities = columns['Quantity']
+    prices = columns['UnitPrice']
+    region_col = columns['Region']
+    product_col = columns['ProductName']
+    customer_col = columns['CustomerID']
+    date_col = columns['Date']
+
+    region_sales = [0.0] * len(region_col['values'])
+    region_counts = [0] * len(region_col['values'])
+    product_qty = [0] * len(product_col['values'])
+    product_revenue = [0.0] * len(product_col['values'])
+    customer_spent = [0.0] * len(customer_col['values'])
+    customer_counts = [0] * len(customer_col['values'])
+    customer_products = [set() for _ in customer_col['values']]
+    daily_revenue = [0.0] * len(date_col['values'])
+    daily_counts = [0] * len(date_col['values'])
+    daily_customers = [set() for _ in date_col['values']]
+
+    total_revenue = aggregates['total_revenue']
+    min_amount = aggregates['min_amount']
+    max_amount = aggregates['max_amount']
+
+    rows = zip(
+        quantities, prices,
+        region_col['codes'], product_col['codes'],
+        customer_col['codes'], date_col['codes']
+    )
+
+    for qty, price, r, p, c, d in rows:
+        amount = qty * price
+        total_revenue += amount
+
+        if min_amount is None or amount < min_amount:
+            min_amount = amount
+        if max_amount is None or amount > max_amount:
+            max_amount = amount
+
+        region_sales[r] += amount
+        region_counts[r] += 1
+        product_qty[p] += qty
+        product_revenue[p] += amount
+        customer_spent[c] += amount
+        customer_counts[c] += 1
+        customer_products[c].add(p)
+        daily_revenue[d] += amount
+        daily_counts[d] += 1
+        daily_customers[d].add(c)
+
+    aggregates['total_revenue'] = total_revenue
+    aggregates['transaction_count'] += table['row_count']
+    aggregates['min_amount'] = min_amount
+    aggregates['max_amount'] = max_amount
+
+    dates = date_col['values']
+    if dates:
+        if aggregates['min_date'] is None or min(dates) < aggregates['min_date']:
+            aggregates['min_date'] = min(dates)
+        if aggregates['max_date'] is None or max(dates) > aggregates['max_date']:
+            aggregates['max_date'] = max(dates)
+
+    aggregates['product_ids'].update(columns['ProductID']['values'])
+
+    product_names = product_col['values']
+    customer_ids = customer_col['values']
+    mode = aggregates.get('distinct_mode', 'exact')
+    error = aggregates.get('distinct_error')
+
+    regions = aggregates.get('regions')
+    if regions is not None:
+        for code, region in enumerate(region_col['values']):
+            entry = regions.setdefault(region, {
+                'total_sales': 0.0,
+                'transaction_count': 0
+            })
+            entry['total_sales'] += region_sales[code]
+            entry['transaction_count'] += region_counts[code]
+
+    products = aggregates.get('products')
+    if products is not None:
+        for code, name in enumerate(product_names):
+            entry = products.setdefault(name, {
+                'quantity': 0,
+                'revenue': 0.0
+            })
+            entry['quantity'] += product_qty[code]
+            entry['revenue'] += product_revenue[code]
+
+    customers = aggregates.get('customers')
+    if customers is not None:
+        for code, cid in enumerate(customer_ids):
+            entry = customers.setdefault(cid, {
+                'total_spent': 0.0,
+                'purchase_count': 0,
+                'products': new_distinct(mode, error)
+            })
+            entry['total_spent'] += customer_spent[code]
+            entry['purchase_count'] += customer_counts[code]
+            distinct_update(entry['products'], (product_names[p] for p in customer_products[code]))
+
+    daily = aggregates.get('daily')
+    if daily is not None:
+        for code, date in enumerate(dates):
+            entry = daily.setdefault(date, {
+                'revenue': 0.0,
+                'transaction_count': 0,
+                'customers': new_distinct(mode, error)
+            })
+            entry['revenue'] += daily_revenue[code]
+            entry['transaction_count'] += daily_counts[code]
+            distinct_update(entry['customers'], (customer_ids[c] for c in daily_customers[code]))
+
+    return aggregates
+
+
+def aggregate_transactions(transactions, groups=ALL_GROUPS, distinct='exact', error=0.01):
+    """
+    Computes every requested group-by over transactions in one pass
+    """
+
+    return update_aggregates(new_aggregates(groups, distinct, error), transactions)
+
+
+# group -> (key column, ranking weight, side total); weights are
+# 'quantity' or 'amount', the side total is named as in new_aggregates
+HEAVY_HITTER_GROUPS = {
+    'products': ('ProductName', 'quantity', 'revenue'),
+    'customers': ('CustomerID', 'amount', 'purchase_count')
+}
+
+
+def heavy_hitters(transactions, group, capacity=SPACE_SAVING_CAPACITY, state=None):
+    """
+    Streams transactions into a Space-Saving summary (see utils.topn) of
+    the biggest products by quantity or customers by spend
+
+    Memory stays at `capacity` keys however many distinct products or
+    customers there are. Each tracked key also sums its revenue
+    (products) or purchase_count (customers). Pass state to keep
+    feeding the same summary, e.g. once per chunk of a streamed file.
+    transactions may also be a columnar table; its rows are summed per
+    key first and added as weighted updates.
+    """
+
+    key_field, weight_name, total_name = HEAVY_HITTER_GROUPS[group]
+    if state is None:
+        state = space_saving_new(capacity)
+
+    if is_table(transactions):
+        columns = transactions['columns']
+        key_col = columns[key_field]
+        weights = [0] * len(key_col['values'])
+        totals = [0] * len(key_col['values'])
+
+        for qty, price, code in zip(columns['Quantity'], columns['UnitPrice'], key_col['codes']):
+            amount = qty * price
+            if weight_name == 'quantity':
+                weights[code] += qty
+                totals[code] += amount
+            else:
+                weights[code] += amount
+                totals[code] += 1
+
+        return space_saving_update(state, (
+            (key, weights[code], {total_name: totals[code]})
+            for code, key in enumerate(key_col['values']) if totals[code]
+        ))
+
+    if weight_name == 'quantity':
+        items = (
+            (t[key_field], t['Quantity'], {total_name: t['Quantity'] * t['UnitPrice']})
+            for t in transactions
+        )
+    else:
+        items = (
+            (t[key_field], t['Quantity'] * t['UnitPrice'], {total_name: 1})
+            for t in transactions
+        )
+    return space_saving_update(state, items)
+
+
+def merge_aggregates(target, other):
+    """
+    Merges the partial aggregates in other into target
+
+    Partials can be built per shard (file, region, day, worker) and merged
+    in any order; percentages, averages and top-N are only derived when
+    the analytics functions finalize the merged state. Returns target.
+    """
+
+    for group in ALL_GROUPS:
+        if group in target and group not in other:
+            raise ValueError(f"Cannot merge aggregates: '{group}' missing from partial")
+
+    mode = target.get('distinct_mode', 'exact')
+    error = target.get('distinct_error')
+    if other.get('distinct_mode', 'exact') != mode:
+        raise ValueError("Cannot merge exact and sketch-based aggregates")
+
+    target['total_revenue'] += other['total_revenue']
+    target['transaction_count'] += other['transaction_count']
+
+    for key, pick in (('min_amount', min), ('max_amount', max), ('min_date', min), ('max_date', max)):
+        if other[key] is not None:
+            target[key] = other[key] if target[key] is None else pick(target[key], other[key])
+
+    target['product_ids'].update(other['product_ids'])
+
+    if 'regions' in target:
+        for region, data in other['regions'].items():
+            entry = target['regions'].setdefault(region, {
+                'total_sales': 0.0,
+                'transaction_count': 0
+            })
+            entry['total_sales'] += data['total_sales']
+            entry['transaction_count'] += data['transaction_count']
+
+    if 'products' in target:
+        for name, data in other['products'].items():
+            entry = target['products'].setdefault(name, {
+                'quantity': 0,
+                'revenue': 0.0
+            })
+            entry['quantity'] += data['quantity']
+            entry['revenue'] += data['revenue']
+
+    if 'customers' in target:
+        for cid, data in other['customers'].items():
+            entry = target['customers'].setdefault(cid, {
+                'total_spent': 0.0,
+                'purchase_count': 0,
+                'products': new_distinct(mode, error)
+            })
+            entry['total_spent'] += data['total_spent']
+            entry['purchase_count'] += data['purchase_count']
+            distinct_merge(entry['products'], data['products'])
+
+    if 'daily' in target:
+        for date, data in other['daily'].items():
+            entry = target['daily'].setdefault(date, {
+                'revenue': 0.0,
+                'transaction_count': 0,
+                'customers': new_distinct(mode, error)
+            })
+            entry['revenue'] += data['revenue']
+            entry['transaction_count'] += data['transaction_count']
+            distinct_merge(entry['customers'], data['customers'])
+
+    return target
+
+
+def combine_aggregates(partials, groups=ALL_GROUPS, distinct='exact', error=0.01):
+    """
+    Merges a sequence of partial aggregates into a new aggregate state
+
+    The partials themselves are left untouched.
+    """
+
+    combined = new_aggregates(groups, distinct, error)
+    for partial in partials:
+        merge_aggregates(combined, partial)
+    return combined
+
+
+def aggregates_to_dict(aggregates):
+    """
+    Converts aggregates to a JSON-serializable dict (sets become lists)
+    """
+
+    data = dict(aggregates)
+    data['product_ids'] = sorted(aggregates['product_ids'])
+
+    if 'customers' in aggregates:
+        data['customers'] = {
+            cid: dict(entry, products=distinct_to_json(entry['products']))
+            for cid, entry in aggregates['customers'].items()
+        }
+
+    if 'daily' in aggregates:
+        data['daily'] = {
+            date: dict(entry, customers=distinct_to_json(entry['customers']))
+            for date, entry in aggregates['daily'].items()
+        }
+
+    return data
+
+
+def aggregates_from_dict(data):
+    """
+    Rebuilds aggregates produced by aggregates_to_dict
+    """
+
+    aggregates = dict(data)
+    aggregates['product_ids'] = set(data['product_ids'])
+
+    if 'customers' in data:
+        aggregates['customers'] = {
+            cid: dict(entry, products=distinct_from_json(entry['products']))
+            for cid, entry in data['customers'].items()
+        }
+
+    if 'daily' in data:
+        aggregates['daily'] = {
+            date: dict(entry, customers=distinct_from_json(entry['customers']))
+            for date, entry in data['daily'].items()
+        }
+
+    return aggregates
@@ -1,35 +1,123 @@
-<<<<<<< HEAD
-def fetch_product_info(product_id):
-=======
-# utils/api_handler.py
+import json
+import os
+import time
 
-def fetch_product_info(product_id):
+from utils.columnar import is_table, iter_table_rows
+from utils.instrumentation import instrumented
+
+API_BASE_URL = "https://dummyjson.com"
+CATALOG_CACHE_FILE = "data/product_cache.json"
+CATALOG_TTL = 24 * 60 * 60  # seconds
+PAGE_SIZE = 100
+REQUEST_TIMEOUT = 10  # seconds
+
+
+def load_catalog_cache(cache_file=CATALOG_CACHE_FILE):
     """
-    Dummy API handler (placeholder)
+    Reads the cached product catalog
+
+    Returns: dict with 'products', 'etag' and 'fetched_at', or None
     """
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
-    return {
-        "product_id": product_id,
-        "category": "Electronics"
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def save_catalog_cache(products, etag, cache_file=CATALOG_CACHE_FILE):
+    cache = {
+        "fetched_at": time.time(),
+        "etag": etag,
+        "products": products
     }
-<<<<<<< HEAD
 
-import requests
+    tmp_file = cache_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_file, cache_file)
 
-def fetch_all_products():
-    url = "https://dummyjson.com/products?limit=100"
+    return cache
 
-    try:
-        response = requests.get(url)
+def _get_page(session, base_url, skip, limit, headers=None):
+    response = session.get(
+        f"{base_url}/products",
+        params={"limit": limit, "skip": skip},
+        headers=headers,
+        timeout=REQUEST_TIMEOUT
+    )
+    if response.status_code != 304:
         response.raise_for_status()
-        data = response.json()
+    return response
+
+@instrumented()
+def fetch_all_products(base_url=API_BASE_URL, cache_file=CATALOG_CACHE_FILE,
+                       ttl=CATALOG_TTL, workers=8, use_cache=True):
+    """
+    Fetches the full product catalog, paging through it concurrently
+
+    A cached copy younger than ttl seconds is served without touching the
+    network. An older copy is revalidated with If-None-Match on the first
+    page, and is still served if the API is unreachable.
+    """
+
+    cache = load_catalog_cache(cache_file) if use_cache else None
+
+    if cache and time.time() - cache["fetched_at"] < ttl:
+        print("✅ Loaded products from cache")
+        return cache["products"]
+
+    try:
+        # The HTTP stack is only imported when the network is actually used
+        from concurrent.futures import ThreadPoolExecutor
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        with requests.Session() as session:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+            headers = {}
+            if cache and cache.get("etag"):
+                headers["If-None-Match"] = cache["etag"]
+
+            first = _get_page(session, base_url, 0, PAGE_SIZE, headers)
+
+            if first.status_code == 304:
+                if use_cache:
+                    save_catalog_cache(cache["products"], cache["etag"], cache_file)
+                print("✅ Product cache is up to date")
+                return cache["products"]
+
+            data = first.json()
+            products = data.get("products", [])
+            total = data.get("total", len(products))
+            # The server may cap the page size below what was requested
+            limit = data.get("limit") or len(products) or PAGE_SIZE
+
+            skips = range(len(products), total, limit)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pages = executor.map(
+                    lambda skip: _get_page(session, base_url, skip, limit).json(),
+                    skips
+                )
+                for page in pages:
+                    products.extend(page.get("products", []))
+
+        if use_cache:
+            save_catalog_cache(products, first.headers.get("ETag"), cache_file)
 
         print("✅ Successfully fetched products from API")
-        return data.get("products", [])
+        return products
 
     except Exception as e:
         print("❌ Failed to fetch products from API")
         print("Error:", e)
+
+        if cache:
+            print("Using cached products instead")
+            return cache["products"]
         return []
 
 def create_product_mapping(api_products):
@@ -44,5 +132,89 @@ def create_product_mapping(api_products):
         }
 
     return product_mapping
-=======
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
+
+def api_product_id(product_id):
+    """
+    Maps a sales ProductID to the API product id (P101 -> 101)
+
+    Returns: int, or None if the ID has no numeric part
+    """
+    digits = product_id.lstrip("P")
+    return int(digits) if digits.isdigit() else None
+
+def lookup_products(product_ids, product_mapping, stats=None):
+    """
+    Resolves distinct sales ProductIDs against the API product mapping
+    (see create_product_mapping)
+
+    Returns: dict of ProductID -> API info (None when there is no match)
+    If a stats dict is given, 'lookups' counts the IDs resolved.
+    """
+
+    result = {
+        product_id: product_mapping.get(api_product_id(product_id))
+        for product_id in dict.fromkeys(product_ids)
+    }
+
+    if stats is not None:
+        stats["lookups"] = stats.get("lookups", 0) + len(result)
+    return result
+
+def iter_enriched_records(transactions, product_mapping, stats=None):
+    """
+    Yields each transaction with API product details added, one at a time
+
+    Each distinct ProductID is resolved once (a table's up front), so
+    only the records being written need to be in memory.
+    stats (optional dict) gets 'lookups' plus 'matched' and 'total',
+    complete once the generator is exhausted.
+    """
+
+    if stats is None:
+        stats = {}
+    stats.setdefault("lookups", 0)
+    stats["matched"] = 0
+    stats["total"] = 0
+
+    if is_table(transactions):
+        product_info = lookup_products(
+            transactions["columns"]["ProductID"]["values"], product_mapping, stats=stats
+        )
+        transactions = iter_table_rows(transactions)
+    else:
+        product_info = {}
+
+    for t in transactions:
+        product_id = t["ProductID"]
+        if product_id not in product_info:
+            product_info.update(lookup_products([product_id], product_mapping, stats=stats))
+
+        info = product_info[product_id]
+        record = dict(t)
+
+        if info:
+            record["API_Category"] = info.get("category")
+            record["API_Brand"] = info.get("brand")
+            record["API_Rating"] = info.get("rating")
+            record["API_Match"] = True
+            stats["matched"] += 1
+        else:
+            record["API_Category"] = None
+            record["API_Brand"] = None
+            record["API_Rating"] = None
+            record["API_Match"] = False
+
+        stats["total"] += 1
+        yield record
+
+@instrumented()
+def enrich_sales_data(transactions, product_mapping, stats=None):
+    """
+    Adds API product details to each transaction
+
+    Returns: list of enriched records (see iter_enriched_records to
+    stream them instead). stats (optional dict) gets lookup counts plus
+    'matched' and 'total'.
+    """
+
+    return list(iter_enriched_records(transactions, product_mapping, stats=stats))
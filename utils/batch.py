@@ -0,0 +1,142 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.aggregator import new_aggregates, update_aggregates, combine_aggregates
+from utils.api_handler import lookup_products
+from utils.dedup import new_deduper, dedup_table
+from utils.file_handler import expand_input_paths, COMPRESSED_OPENERS
+from utils.line_parser import iter_table_batches
+from utils.query import filter_table
+from utils.report_generator import generate_sales_report
+
+
+COMBINED_REPORT_NAME = "combined_report.txt"
+
+
+def report_name(file_path, used):
+    """
+    Per-file report name: data/2024-12-01.txt.gz -> 2024-12-01_report.txt
+
+    Names already in `used` get a numeric suffix, so inputs with the same
+    file name in different directories don't overwrite each other.
+    """
+
+    name = os.path.basename(file_path)
+    for suffix in COMPRESSED_OPENERS:
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+    stem = os.path.splitext(name)[0] or name
+
+    candidate = f"{stem}_report.txt"
+    counter = 2
+    while candidate in used or candidate == COMBINED_REPORT_NAME:
+        candidate = f"{stem}_{counter}_report.txt"
+        counter += 1
+
+    used.add(candidate)
+    return candidate
+
+
+def _write_report(aggregates, product_map, output_file, formats):
+    product_info = lookup_products(sorted(aggregates["product_ids"]), product_map)
+    enriched_products = {pid: info for pid, info in product_info.items() if info}
+    generate_sales_report(None, enriched_products, output_file, aggregates=aggregates, formats=formats)
+
+
+def process_file(job):
+    """
+    Streams one sales file through dedup, the filters and aggregation, and
+    writes its report (runs in a worker process)
+
+    Returns: dict with the file, its stats, its aggregates (for the
+    combined report), the report path (None when no rows matched) and an
+    error message (None on success)
+    """
+
+    file_path, filters, product_map, output_file, formats = job
+    result = {"file": file_path, "report": None, "aggregates": None, "stats": None, "error": None}
+
+    try:
+        stats = {"duplicates": 0, "filtered": 0}
+        aggregates = new_aggregates()
+        deduper = new_deduper()
+
+        for batch in iter_table_batches(file_path, stats=stats):
+            batch = dedup_table(deduper, batch, stats)
+            if filters:
+                matched = filter_table(batch, **filters)
+                stats["filtered"] += batch["row_count"] - matched["row_count"]
+                batch = matched
+            update_aggregates(aggregates, batch)
+
+        if aggregates["transaction_count"]:
+            _write_report(aggregates, product_map, output_file, formats)
+            result["report"] = output_file
+
+        result["aggregates"] = aggregates
+        result["stats"] = stats
+
+    except Exception as e:
+        result["error"] = str(e)
+
+    return result
+
+
+def run_batch(paths, output_dir="output", filters=None, workers=None, product_map=None,
+              formats=('text',)):
+    """
+    Processes many sales files (paths or globs) in a process pool
+
+    Each file gets its own report in output_dir, and the aggregates of all
+    files are merged into a combined report, each in every requested format
+    (see report_generator.report_paths). Duplicate TransactionIDs are
+    dropped within each file.
+
+    Returns: list of per-file results (see process_file) in input order
+    """
+
+    filters = {key: value for key, value in (filters or {}).items() if value is not None}
+    product_map = product_map or {}
+    os.makedirs(output_dir, exist_ok=True)
+
+    used = set()
+    jobs = [
+        (path, filters, product_map, os.path.join(output_dir, report_name(path, used)), formats)
+        for path in expand_input_paths(paths)
+    ]
+
+    if not jobs:
+        print("No input files to process")
+        return []
+
+    print(f"Processing {len(jobs)} file(s)...")
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(process_file, jobs):
+            results.append(result)
+
+            if result["error"]:
+                print(f"❌ {result['file']}: {result['error']}")
+                continue
+
+            stats = result["stats"]
+            valid = stats["total"] - stats["invalid"] - stats["duplicates"]
+            print(
+                f"✓ {result['file']}: {valid} valid | {stats['invalid']} invalid | "
+                f"{stats['duplicates']} duplicates | {stats['filtered']} filtered out"
+            )
+            if result["report"] is None:
+                print("  No matching transactions, report skipped")
+
+    partials = [result["aggregates"] for result in results if result["aggregates"]]
+    combined = combine_aggregates(partials)
+
+    if combined["transaction_count"]:
+        combined_file = os.path.join(output_dir, COMBINED_REPORT_NAME)
+        _write_report(combined, product_map, combined_file, formats)
+        print(f"✓ Combined report saved to: {combined_file}")
+    else:
+        print("No matching transactions in any file, combined report skipped")
+
+    return results
@@ -0,0 +1,191 @@
+from array import array
+
+
+NUMERIC_COLUMNS = {
+    'Quantity': 'q',
+    'UnitPrice': 'd'
+}
+
+ENCODED_COLUMNS = ('Date', 'ProductID', 'ProductName', 'CustomerID', 'Region')
+
+
+def new_encoded_column():
+    """
+    Creates an empty dictionary-encoded column
+
+    codes holds one small integer per row; values[code] is the string.
+    Codes are assigned in order of first appearance.
+    """
+
+    return {
+        'codes': array('I'),
+        'values': [],
+        'index': {}
+    }
+
+
+def new_table():
+    """
+    Creates an empty columnar transaction table
+    """
+
+    columns = {'TransactionID': []}
+
+    for name, typecode in NUMERIC_COLUMNS.items():
+        columns[name] = array(typecode)
+
+    for name in ENCODED_COLUMNS:
+        columns[name] = new_encoded_column()
+
+    return {
+        'row_count': 0,
+        'columns': columns
+    }
+
+
+def is_table(obj):
+    """
+    Checks whether obj is a columnar table rather than a list of dicts
+    """
+
+    return isinstance(obj, dict) and 'columns' in obj and 'row_count' in obj
+
+
+def row_count(transactions):
+    """
+    Number of rows in a table or a list of transaction dicts
+    """
+
+    if is_table(transactions):
+        return transactions['row_count']
+    return len(transactions)
+
+
+def append_transactions(table, transactions):
+    """
+    Appends transaction dicts (e.g. a chunk from stream_valid_records)
+    """
+
+    columns = table['columns']
+    transaction_ids = columns['TransactionID']
+    quantities = columns['Quantity']
+    prices = columns['UnitPrice']
+    encoded = [(name, columns[name]) for name in ENCODED_COLUMNS]
+
+    for t in transactions:
+        transaction_ids.append(t['TransactionID'])
+        quantities.append(t['Quantity'])
+        prices.append(t['UnitPrice'])
+
+        for name, column in encoded:
+            value = t[name]
+            code = column['index'].get(value)
+            if code is None:
+                code = column['index'][value] = len(column['values'])
+                column['values'].append(value)
+            column['codes'].append(code)
+
+        table['row_count'] += 1
+
+    return table
+
+
+def extend_table(table, other):
+    """
+    Appends all rows of another table, re-mapping its dictionary codes
+    """
+
+    columns = table['columns']
+    other_columns = other['columns']
+
+    columns['TransactionID'].extend(other_columns['TransactionID'])
+    for name in NUMERIC_COLUMNS:
+        columns[name].extend(other_columns[name])
+
+    for name in ENCODED_COLUMNS:
+        column = columns[name]
+        mapping = []
+        for value in other_columns[name]['values']:
+            code = column['index'].get(value)
+            if code is None:
+                code = column['index'][value] = len(column['values'])
+                column['values'].append(value)
+            mapping.append(code)
+
+        if mapping == list(range(len(mapping))):
+            # Same dictionary order (e.g. the first batch): copy codes as-is
+            column['codes'].extend(other_columns[name]['codes'])
+        else:
+            column['codes'].extend(array('I', map(mapping.__getitem__, other_columns[name]['codes'])))
+
+    table['row_count'] += other['row_count']
+    return table
+
+
+def take_rows(table, row_ids):
+    """
+    Builds a new table holding only the given rows, in the given order
+
+    Dictionaries are rebuilt so they only contain values that occur in
+    the selected rows.
+    """
+
+    columns = table['columns']
+    result = new_table()
+    result_columns = result['columns']
+
+    source_ids = columns['TransactionID']
+    result_columns['TransactionID'] = [source_ids[i] for i in row_ids]
+
+    for name, typecode in NUMERIC_COLUMNS.items():
+        source = columns[name]
+        result_columns[name] = array(typecode, (source[i] for i in row_ids))
+
+    for name in ENCODED_COLUMNS:
+        source = columns[name]
+        column = result_columns[name]
+        remap = {}
+        for i in row_ids:
+            old = source['codes'][i]
+            code = remap.get(old)
+            if code is None:
+                value = source['values'][old]
+                code = remap[old] = column['index'][value] = len(column['values'])
+                column['values'].append(value)
+            column['codes'].append(code)
+
+    result['row_count'] = len(result_columns['TransactionID'])
+    return result
+
+
+def table_from_transactions(transactions):
+    """
+    Builds a columnar table from any iterable of transaction dicts
+    """
+
+    return append_transactions(new_table(), transactions)
+
+
+def iter_table_rows(table):
+    """
+    Yields each row of the table as a transaction dict
+    """
+
+    columns = table['columns']
+    dates = columns['Date']
+    product_ids = columns['ProductID']
+    product_names = columns['ProductName']
+    customers = columns['CustomerID']
+    regions = columns['Region']
+
+    for i in range(table['row_count']):
+        yield {
+            'TransactionID': columns['TransactionID'][i],
+            'Date': dates['values'][dates['codes'][i]],
+            'ProductID': product_ids['values'][product_ids['codes'][i]],
+            'ProductName': product_names['values'][product_names['codes'][i]],
+            'Quantity': columns['Quantity'][i],
+            'UnitPrice': columns['UnitPrice'][i],
+            'CustomerID': customers['values'][customers['codes'][i]],
+            'Region': regions['values'][regions['codes'][i]]
+        }
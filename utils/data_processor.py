@@ -1,146 +1,302 @@
-def clean_and_validate_data(lines):
-<<<<<<< HEAD
-=======
-    total_records = 0
-    invalid_records = 0
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
-    valid_records = []
+import os
+
+from utils.aggregator import (
+    ALL_GROUPS, aggregate_transactions, new_aggregates, update_aggregates,
+    combine_aggregates, heavy_hitters
+)
+from utils.columnar import (
+    is_table, new_table, extend_table, row_count,
+    table_from_transactions, iter_table_rows
+)
+from utils.file_handler import (
+    split_file_ranges, read_raw_range, detect_file_encoding, expand_input_paths,
+    is_compressed
+)
+from utils.line_parser import parse_sales_line, parse_buffer, iter_table_batches
+from utils.instrumentation import instrumented
+from utils.topn import SPACE_SAVING_CAPACITY, top_n, bottom_n, check_top_mode, space_saving_top
+from utils.sketches import distinct_count
+from utils.dedup import as_deduper, dedup_records, dedup_table, close_deduper
+
+
+def stream_valid_records(lines, chunk_size=10000, stats=None, skip_header=True, dedup=None):
+    """
+    Cleans and validates lines lazily, yielding lists of at most
+    chunk_size valid records so memory stays bounded
+
+    lines can be any iterable (e.g. file_handler.iter_sales_file).
+    If a stats dict is given, its 'total', 'invalid' and 'duplicates'
+    counts are updated. skip_header=False is for lines that don't start
+    at the top of a file. With a dedup state (see utils.dedup), rows whose
+    TransactionID was already seen are dropped.
+    """
+
+    if stats is None:
+        stats = {}
+    stats.setdefault("total", 0)
+    stats.setdefault("invalid", 0)
+    stats.setdefault("duplicates", 0)
+
+    chunk = []
 
     for index, line in enumerate(lines):
         line = line.strip()
 
-<<<<<<< HEAD
         # Skip header
-        if index == 0:
-            continue
-=======
-        if index == 0:
+        if index == 0 and skip_header:
             continue
-            
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
 
         if not line:
             continue
 
-<<<<<<< HEAD
-        parts = line.split("|")
-        if len(parts) != 8:
-=======
-        total_records += 1
-        parts = line.split("|")
+        stats["total"] += 1
+        record = parse_sales_line(line)
 
-        if len(parts) != 8:
-            invalid_records += 1
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
+        if record is None:
+            stats["invalid"] += 1
             continue
 
-        (
-            transaction_id,
-            date,
-            product_id,
-            product_name,
-            quantity,
-            unit_price,
-            customer_id,
-            region
-        ) = parts
-
-        if not transaction_id.startswith("T"):
-<<<<<<< HEAD
-            continue
+        chunk.append(record)
 
-        if not customer_id or not region:
-            continue
+        if len(chunk) >= chunk_size:
+            if dedup is not None:
+                chunk = dedup_records(dedup, chunk, stats)
+            yield chunk
+            chunk = []
 
-        try:
-            quantity = int(quantity)
-            unit_price = float(unit_price.replace(",", ""))
-        except ValueError:
-            continue
+    if dedup is not None:
+        chunk = dedup_records(dedup, chunk, stats)
+    if chunk:
+        yield chunk
 
-        if quantity <= 0 or unit_price <= 0:
-=======
-            invalid_records += 1
-            continue
 
-        if not customer_id or not region:
-            invalid_records += 1
-            continue
+@instrumented()
+def clean_and_validate_data(lines, dedup='exact'):
+    """
+    Cleans and validates all lines, dropping repeated TransactionIDs
 
-        product_name = product_name.replace(",", "")
+    dedup is a mode ('exact' or 'bloom', see utils.dedup), an existing
+    dedup state to carry across calls, or None to keep duplicates.
+    """
 
-        try:
-            quantity = int(quantity)
-            unit_price = float(unit_price.replace(",", ""))
-        except:
-            invalid_records += 1
-            continue
+    stats = {}
+    valid_records = []
+    deduper, owned = as_deduper(dedup)
+
+    try:
+        for chunk in stream_valid_records(lines, stats=stats, dedup=deduper):
+            valid_records.extend(chunk)
+    finally:
+        if owned:
+            close_deduper(deduper)
+
+    print(f"Total records parsed: {stats['total']}")
+    print(f"Invalid records removed: {stats['invalid']}")
+    print(f"Duplicate records removed: {stats['duplicates']}")
+    print(f"Valid records after cleaning: {len(valid_records)}")
+    return valid_records
+
+
+def _validate_byte_range(job):
+    """
+    Process pool worker: parses and validates one byte range of a file,
+    or a whole compressed file (start is None), which cannot be split
+
+    Returns a columnar table, which pickles far more compactly than dicts.
+    """
+
+    file_path, start, end, encoding = job
+    stats = {}
+
+    if start is None:
+        table = new_table()
+        for batch in iter_table_batches(file_path, stats=stats, encoding=encoding):
+            extend_table(table, batch)
+        return table, stats
 
-        if quantity <= 0 or unit_price <= 0:
-            invalid_records += 1
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
+    data = read_raw_range(file_path, start, end)
+    table = parse_buffer(data, stats=stats, encoding=encoding, skip_header=(start == 0))
+    return table, stats
+
+
+@instrumented(rows=row_count)
+def parallel_clean_and_validate(file_path, workers=None, encoding=None, as_table=False, dedup='exact'):
+    """
+    Parallel version of clean_and_validate_data for large files
+
+    The file is split into byte ranges on line boundaries which are parsed
+    and validated in a process pool; results are merged in file order.
+    file_path may also be a glob or a list of files; compressed files are
+    each handled by one worker. The encoding is detected once per file
+    here unless given, not in every worker. Repeated TransactionIDs are
+    dropped after the merge, in file order (see clean_and_validate_data).
+
+    Returns: list of transaction dicts, or a columnar table if as_table=True
+    """
+
+    # Deferred: the process pool machinery is only needed by parallel runs
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    jobs = []
+
+    for path in expand_input_paths(file_path):
+        path_encoding = encoding or detect_file_encoding(path)
+        if is_compressed(path):
+            jobs.append((path, None, None, path_encoding))
             continue
+        # A few ranges per worker keeps the pool busy if some finish early
+        ranges = split_file_ranges(path, workers * 4)
+        jobs.extend((path, start, end, path_encoding) for start, end in ranges)
+
+    stats = {"total": 0, "invalid": 0}
+    merged = new_table()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for table, part_stats in executor.map(_validate_byte_range, jobs):
+            extend_table(merged, table)
+            stats["total"] += part_stats["total"]
+            stats["invalid"] += part_stats["invalid"]
+
+    stats["duplicates"] = 0
+    deduper, owned = as_deduper(dedup)
+    if deduper is not None:
+        merged = dedup_table(deduper, merged, stats)
+        if owned:
+            close_deduper(deduper)
+
+    print(f"Total records parsed: {stats['total']}")
+    print(f"Invalid records removed: {stats['invalid']}")
+    print(f"Duplicate records removed: {stats['duplicates']}")
+    print(f"Valid records after cleaning: {merged['row_count']}")
+
+    if as_table:
+        return merged
+    return list(iter_table_rows(merged))
+
+
+@instrumented(rows=lambda aggregates: aggregates["transaction_count"])
+def aggregate_file(file_path, groups=ALL_GROUPS, stats=None, encoding=None, dedup=None):
+    """
+    Streams one sales file (plain or .gz/.bz2/.xz) into partial
+    aggregates (see utils.aggregator)
 
-        valid_records.append({
-            "TransactionID": transaction_id,
-            "Date": date,
-            "ProductID": product_id,
-<<<<<<< HEAD
-            "ProductName": product_name.replace(",", ""),
-=======
-            "ProductName": product_name,
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
-            "Quantity": quantity,
-            "UnitPrice": unit_price,
-            "CustomerID": customer_id,
-            "Region": region
-        })
-
-<<<<<<< HEAD
-    print(f"Valid records after cleaning: {len(valid_records)}")
-    return valid_records
+    This is the map step for sharded processing: partials built per file
+    can be combined later with merge_aggregates / combine_aggregates.
+    A dedup mode or state drops repeated TransactionIDs first.
+    """
+
+    aggregates = new_aggregates(groups)
+    deduper, owned = as_deduper(dedup)
+
+    try:
+        for batch in iter_table_batches(file_path, stats=stats, encoding=encoding):
+            if deduper is not None:
+                batch = dedup_table(deduper, batch, stats)
+            update_aggregates(aggregates, batch)
+    finally:
+        if owned:
+            close_deduper(deduper)
+
+    return aggregates
+
+
+def _aggregate_file_job(job):
+    file_path, groups, encoding = job
+    stats = {}
+    return aggregate_file(file_path, groups, stats, encoding), stats
 
 
-def calculate_total_revenue(transactions):
+@instrumented(rows=lambda result: result[0]["transaction_count"])
+def parallel_aggregate_files(file_paths, workers=None, groups=ALL_GROUPS, encoding=None):
+    """
+    Aggregates many sales files (e.g. one per region or day, given as
+    paths or globs) in a process pool and merges the partial results
+
+    Returns: (aggregates, stats) with summed total/invalid counts
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = [(path, groups, encoding) for path in expand_input_paths(file_paths)]
+    stats = {"total": 0, "invalid": 0}
+    partials = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial, part_stats in executor.map(_aggregate_file_job, jobs):
+            partials.append(partial)
+            stats["total"] += part_stats["total"]
+            stats["invalid"] += part_stats["invalid"]
+
+    return combine_aggregates(partials, groups), stats
+
+
+def _use_numpy(backend, aggregates):
+    """
+    Decides whether a call should run on the NumPy backend
+
+    Precomputed aggregates are always cheaper than another scan.
+    """
+
+    if backend not in ('python', 'numpy'):
+        raise ValueError(f"Unknown backend: {backend!r} (expected 'python' or 'numpy')")
+
+    return backend == 'numpy' and aggregates is None
+
+
+def _vectorized():
+    # NumPy takes longer to import than the rest of the pipeline, so it is
+    # only loaded once a call actually runs on the numpy backend
+    from utils import vectorized
+    return vectorized
+
+
+def _as_table(transactions):
+    if is_table(transactions):
+        return transactions
+    return table_from_transactions(transactions)
+
+
+@instrumented(rows=None)
+def calculate_total_revenue(transactions, aggregates=None, backend='python'):
     """
     Calculates total revenue from all transactions
+
+    If precomputed aggregates (see utils.aggregator) are given,
+    transactions are not scanned again. backend='numpy' runs the
+    vectorized implementation in utils.vectorized with identical results.
     """
 
-    total_revenue = 0.0
+    if _use_numpy(backend, aggregates):
+        return _vectorized().calculate_total_revenue(_as_table(transactions))
 
-    for t in transactions:
-        total_revenue += t['Quantity'] * t['UnitPrice']
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions, groups=())
 
-    return total_revenue
+    return aggregates['total_revenue']
 
-def region_wise_sales(transactions):
+@instrumented(rows=None)
+def region_wise_sales(transactions, aggregates=None, backend='python'):
     """
     Analyzes sales by region
     """
 
-    region_data = {}
-    overall_sales = 0.0
-
-    # First pass: total sales and counts
-    for t in transactions:
-        region = t['Region']
-        amount = t['Quantity'] * t['UnitPrice']
-        overall_sales += amount
-
-        if region not in region_data:
-            region_data[region] = {
-                'total_sales': 0.0,
-                'transaction_count': 0
-            }
+    if _use_numpy(backend, aggregates):
+        return _vectorized().region_wise_sales(_as_table(transactions))
 
-        region_data[region]['total_sales'] += amount
-        region_data[region]['transaction_count'] += 1
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions, groups=('regions',))
 
-    # Second pass: calculate percentage
-    for region in region_data:
-        region_data[region]['percentage'] = round(
-            (region_data[region]['total_sales'] / overall_sales) * 100, 2
-        )
+    overall_sales = aggregates['total_revenue']
+    region_data = {}
+
+    # Calculate percentage
+    for region, data in aggregates['regions'].items():
+        region_data[region] = {
+            'total_sales': data['total_sales'],
+            'transaction_count': data['transaction_count'],
+            'percentage': round((data['total_sales'] / overall_sales) * 100, 2)
+        }
 
     # Sort by total_sales descending
     sorted_regions = dict(
@@ -153,121 +309,143 @@ def region_wise_sales(transactions):
 
     return sorted_regions
 
-def top_selling_products(transactions, n=5):
+@instrumented(rows=None)
+def top_selling_products(transactions, n=5, aggregates=None, backend='python', mode='exact',
+                         capacity=SPACE_SAVING_CAPACITY):
     """
     Finds top n products by total quantity sold
-    """
 
-    product_data = {}
+    mode='approx' streams transactions through a Space-Saving summary of
+    `capacity` products instead of grouping every product (quantities
+    are estimates, exact for products tracked from their first sale).
+    It only applies when aggregates are not given.
+    """
 
-    for t in transactions:
-        name = t['ProductName']
-        qty = t['Quantity']
-        revenue = qty * t['UnitPrice']
+    if check_top_mode(mode) == 'approx' and aggregates is None:
+        state = heavy_hitters(transactions, 'products', capacity)
+        return [
+            (name, quantity, state['totals'][name]['revenue'])
+            for name, quantity, _ in space_saving_top(state, n)
+        ]
 
-        if name not in product_data:
-            product_data[name] = {
-                'quantity': 0,
-                'revenue': 0.0
-            }
+    if _use_numpy(backend, aggregates):
+        return _vectorized().top_selling_products(_as_table(transactions), n)
 
-        product_data[name]['quantity'] += qty
-        product_data[name]['revenue'] += revenue
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions, groups=('products',))
 
-    sorted_products = sorted(
-        product_data.items(),
-        key=lambda x: x[1]['quantity'],
-        reverse=True
+    # Heap selection keeps n items instead of sorting every product
+    top_products = top_n(
+        aggregates['products'].items(),
+        n,
+        key=lambda x: x[1]['quantity']
     )
 
     result = []
-    for name, data in sorted_products[:n]:
+    for name, data in top_products:
         result.append((name, data['quantity'], data['revenue']))
 
     return result
 
-def customer_analysis(transactions):
+@instrumented(rows=None)
+def customer_analysis(transactions, aggregates=None, n=None, distinct='exact', error=0.01,
+                      mode='exact', capacity=SPACE_SAVING_CAPACITY):
     """
     Analyzes customer purchase patterns
-    """
 
-    customer_data = {}
+    With n, only the n biggest spenders are returned (heap selection,
+    no full sort of all customers). With distinct='hll' (or sketch-based
+    aggregates), 'products_bought' is replaced by an approximate
+    'unique_products' count with relative standard error `error`.
 
-    for t in transactions:
-        customer_id = t['CustomerID']
-        amount = t['Quantity'] * t['UnitPrice']
-        product = t['ProductName']
+    mode='approx' (without aggregates) keeps only a Space-Saving summary
+    of `capacity` customers while streaming: each entry has a
+    'max_error' (how much total_spent may be overestimated) instead of
+    product details.
+    """
 
-        if customer_id not in customer_data:
-            customer_data[customer_id] = {
-                'total_spent': 0.0,
-                'purchase_count': 0,
-                'products': set()
+    if check_top_mode(mode) == 'approx' and aggregates is None:
+        state = heavy_hitters(transactions, 'customers', capacity)
+        result = {}
+        for cid, spent, max_error in space_saving_top(state, n):
+            purchases = state['totals'][cid]['purchase_count']
+            result[cid] = {
+                'total_spent': spent,
+                'purchase_count': purchases,
+                'avg_order_value': round(spent / purchases, 2),
+                'max_error': max_error
             }
+        return result
+
+    if aggregates is None:
+        aggregates = aggregate_transactions(
+            transactions, groups=('customers',), distinct=distinct, error=error
+        )
 
-        customer_data[customer_id]['total_spent'] += amount
-        customer_data[customer_id]['purchase_count'] += 1
-        customer_data[customer_id]['products'].add(product)
+    customers = aggregates['customers'].items()
+    if n is not None:
+        customers = top_n(customers, n, key=lambda x: x[1]['total_spent'])
 
     result = {}
 
-    for cid, data in customer_data.items():
+    for cid, data in customers:
         result[cid] = {
             'total_spent': data['total_spent'],
             'purchase_count': data['purchase_count'],
             'avg_order_value': round(
                 data['total_spent'] / data['purchase_count'], 2
-            ),
-            'products_bought': list(data['products'])
+            )
         }
 
+        if isinstance(data['products'], set):
+            result[cid]['products_bought'] = list(data['products'])
+        else:
+            result[cid]['unique_products'] = distinct_count(data['products'])
+
     return dict(
-        sorted(
+        top_n(
             result.items(),
-            key=lambda x: x[1]['total_spent'],
-            reverse=True
+            None,
+            key=lambda x: x[1]['total_spent']
         )
     )
 
-def daily_sales_trend(transactions):
+@instrumented(rows=None)
+def daily_sales_trend(transactions, aggregates=None, distinct='exact', error=0.01):
     """
     Analyzes sales trends by date
-    """
-
-    daily_data = {}
 
-    for t in transactions:
-        date = t['Date']
-        revenue = t['Quantity'] * t['UnitPrice']
-        customer = t['CustomerID']
+    distinct='hll' counts unique customers with fixed-size sketches,
+    sized for the relative standard error `error`.
+    """
 
-        if date not in daily_data:
-            daily_data[date] = {
-                'revenue': 0.0,
-                'transaction_count': 0,
-                'customers': set()
-            }
+    if aggregates is None:
+        aggregates = aggregate_transactions(
+            transactions, groups=('daily',), distinct=distinct, error=error
+        )
 
-        daily_data[date]['revenue'] += revenue
-        daily_data[date]['transaction_count'] += 1
-        daily_data[date]['customers'].add(customer)
+    daily_data = aggregates['daily']
 
     result = {}
     for date in sorted(daily_data.keys()):
         result[date] = {
             'revenue': daily_data[date]['revenue'],
             'transaction_count': daily_data[date]['transaction_count'],
-            'unique_customers': len(daily_data[date]['customers'])
+            'unique_customers': distinct_count(daily_data[date]['customers'])
         }
 
     return result
 
-def find_peak_sales_day(transactions):
+@instrumented(rows=None)
+def find_peak_sales_day(transactions, aggregates=None, backend='python'):
     """
     Identifies the date with highest revenue
     """
 
-    daily = daily_sales_trend(transactions)
+    if _use_numpy(backend, aggregates):
+        return _vectorized().find_peak_sales_day(_as_table(transactions))
+
+    daily = daily_sales_trend(transactions, aggregates=aggregates)
 
     peak_date = None
     max_revenue = 0.0
@@ -281,41 +459,26 @@ def find_peak_sales_day(transactions):
 
     return (peak_date, max_revenue, peak_count)
 
-def low_performing_products(transactions, threshold=10):
+@instrumented(rows=None)
+def low_performing_products(transactions, threshold=10, aggregates=None, backend='python', n=None):
     """
     Identifies products with low sales
-    """
-
-    product_data = {}
 
-    for t in transactions:
-        name = t['ProductName']
-        qty = t['Quantity']
-        revenue = qty * t['UnitPrice']
+    With n, only the n slowest sellers are returned.
+    """
 
-        if name not in product_data:
-            product_data[name] = {
-                'quantity': 0,
-                'revenue': 0.0
-            }
+    if _use_numpy(backend, aggregates):
+        result = _vectorized().low_performing_products(_as_table(transactions), threshold)
+        return bottom_n(result, n, key=lambda x: x[1])
 
-        product_data[name]['quantity'] += qty
-        product_data[name]['revenue'] += revenue
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions, groups=('products',))
 
     result = []
 
-    for name, data in product_data.items():
+    for name, data in aggregates['products'].items():
         if data['quantity'] < threshold:
             result.append((name, data['quantity'], data['revenue']))
 
-    result.sort(key=lambda x: x[1])  # sort by quantity ascending
-
-    return result
-
-=======
-    print(f"Total records parsed: {total_records}")
-    print(f"Invalid records removed: {invalid_records}")
-    print(f"Valid records after cleaning: {len(valid_records)}")
-
-    return valid_records
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
+    # Sort by quantity ascending
+    return bottom_n(result, n, key=lambda x: x[1])
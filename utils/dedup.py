@@ -0,0 +1,329 @@
+import base64
+import math
+import os
+from array import array
+
+from utils.columnar import take_rows
+from utils.sketches import hash64
+
+
+DEDUP_MODES = ('exact', 'bloom')
+EXACT_INITIAL_SLOTS = 1 << 16
+
+
+def _open_spill(spill_file):
+    # Only bloom mode needs SQLite; exact runs skip loading it
+    import sqlite3
+
+    connection = sqlite3.connect(spill_file)
+    connection.execute(
+        'CREATE TABLE IF NOT EXISTS transaction_ids (id TEXT PRIMARY KEY, run INTEGER) WITHOUT ROWID'
+    )
+    return connection
+
+
+def _new_exact():
+    return {
+        'mode': 'exact',
+        'slots': array('Q', bytes(8 * EXACT_INITIAL_SLOTS)),  # entry number + 1, 0 if empty
+        'hashes': array('Q'),
+        'ends': array('Q'),  # end offset of each ID in 'ids'
+        'ids': bytearray(),
+        'count': 0
+    }
+
+
+def new_deduper(mode='exact', capacity=1000000, error_rate=0.001, spill_file=None):
+    """
+    Creates a TransactionID de-duplication state
+
+    'exact' packs the UTF-8 bytes of every ID into one buffer, indexed by
+    an open-addressing table of their 64-bit hashes (about 32-48 bytes
+    per ID plus the ID itself, far less than a set of strings); a hash
+    match only counts once the stored ID bytes match too. 'bloom' keeps
+    a fixed-size Bloom filter sized for `capacity` IDs at `error_rate`
+    false positives; every "maybe seen" answer is confirmed against the
+    IDs spilled to an SQLite file (a temporary one unless spill_file is
+    given). In both modes a new row is never dropped.
+    """
+
+    if mode == 'exact':
+        return _new_exact()
+
+    if mode == 'bloom':
+        num_bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+
+        temporary = spill_file is None
+        if temporary:
+            import tempfile
+            fd, spill_file = tempfile.mkstemp(prefix='sales_ids_', suffix='.sqlite')
+            os.close(fd)
+
+        connection = _open_spill(spill_file)
+        connection.execute('DELETE FROM transaction_ids')
+        connection.commit()
+
+        return {
+            'mode': 'bloom',
+            'bits': bytearray((num_bits + 7) // 8),
+            'num_bits': num_bits,
+            'num_hashes': num_hashes,
+            'count': 0,
+            'spill_file': spill_file,
+            'temporary': temporary,
+            'connection': connection,
+            'pending': set(),
+            'run': 1
+        }
+
+    raise ValueError(f"Unknown dedup mode: {mode!r} (expected one of {DEDUP_MODES})")
+
+
+def as_deduper(dedup):
+    """
+    Accepts None (no de-duplication), a mode name or an existing state
+
+    Returns: (state or None, whether the caller created it and must close it)
+    """
+
+    if dedup is None or isinstance(dedup, dict):
+        return dedup, False
+    return new_deduper(dedup), True
+
+
+def _exact_grow(state):
+    slots = state['slots'] = array('Q', bytes(16 * len(state['slots'])))
+    mask = len(slots) - 1
+
+    for entry, h in enumerate(state['hashes']):
+        i = h & mask
+        while slots[i]:
+            i = (i + 1) & mask
+        slots[i] = entry + 1
+
+
+def _exact_add(state, transaction_id):
+    key = str(transaction_id).encode('utf-8')
+    h = hash64(transaction_id)
+    slots = state['slots']
+    hashes = state['hashes']
+    ends = state['ends']
+    ids = state['ids']
+    mask = len(slots) - 1
+    i = h & mask
+
+    while True:
+        slot = slots[i]
+        if not slot:
+            break
+        entry = slot - 1
+        if hashes[entry] == h:
+            # Different IDs can share a hash; only the bytes decide
+            start = ends[entry - 1] if entry else 0
+            if ids[start:ends[entry]] == key:
+                return False
+        i = (i + 1) & mask
+
+    ids += key
+    hashes.append(h)
+    ends.append(len(ids))
+    state['count'] += 1
+    slots[i] = state['count']
+    if state['count'] * 2 > len(slots):
+        _exact_grow(state)
+    return True
+
+
+def _bloom_add(state, transaction_id):
+    transaction_id = str(transaction_id)
+    h = hash64(transaction_id)
+    bits = state['bits']
+    num_bits = state['num_bits']
+    # Double hashing: k bit positions from the two halves of one hash
+    h1 = h & 0xFFFFFFFF
+    h2 = (h >> 32) | 1
+
+    maybe_seen = True
+    for i in range(state['num_hashes']):
+        bit = (h1 + i * h2) % num_bits
+        byte = bits[bit >> 3]
+        mask = 1 << (bit & 7)
+        if not byte & mask:
+            maybe_seen = False
+            bits[bit >> 3] = byte | mask
+
+    pending = state['pending']
+    if maybe_seen:
+        if transaction_id in pending:
+            return False
+        found = state['connection'].execute(
+            'SELECT 1 FROM transaction_ids WHERE id = ?', (transaction_id,)
+        ).fetchone()
+        if found:
+            return False
+
+    pending.add(transaction_id)
+    state['count'] += 1
+    return True
+
+
+def _flush(state):
+    if state['mode'] == 'bloom' and state['pending']:
+        run = state['run']
+        state['connection'].executemany(
+            'INSERT OR IGNORE INTO transaction_ids (id, run) VALUES (?, ?)',
+            ((transaction_id, run) for transaction_id in state['pending'])
+        )
+        state['pending'].clear()
+
+
+def _new_flags(state, transaction_ids):
+    """
+    Returns one flag per ID: True for its first occurrence, recording it
+    """
+
+    add = _exact_add if state['mode'] == 'exact' else _bloom_add
+    flags = [add(state, tid) for tid in transaction_ids]
+    _flush(state)
+    return flags
+
+
+def dedup_records(state, records, stats=None):
+    """
+    Drops transaction dicts whose TransactionID was already seen (earlier
+    in the same call, or in any earlier call with this state)
+
+    stats['duplicates'] (if a stats dict is given) counts the dropped rows.
+    """
+
+    flags = _new_flags(state, (t['TransactionID'] for t in records))
+    fresh = [t for t, is_new in zip(records, flags) if is_new]
+
+    if stats is not None:
+        stats['duplicates'] = stats.get('duplicates', 0) + len(records) - len(fresh)
+    return fresh
+
+
+def dedup_table(state, table, stats=None, dropped=None):
+    """
+    Columnar version of dedup_records; the table is returned unchanged
+    when it holds no duplicates
+
+    dropped (optional set) collects the TransactionIDs of dropped rows,
+    see replay_dedup_table.
+    """
+
+    transaction_ids = table['columns']['TransactionID']
+    flags = _new_flags(state, transaction_ids)
+    duplicates = flags.count(False)
+
+    if stats is not None:
+        stats['duplicates'] = stats.get('duplicates', 0) + duplicates
+    if not duplicates:
+        return table
+    if dropped is not None:
+        dropped.update(tid for tid, is_new in zip(transaction_ids, flags) if not is_new)
+    return take_rows(table, [i for i, is_new in enumerate(flags) if is_new])
+
+
+def replay_dedup_table(table, dropped, seen):
+    """
+    Repeats an earlier dedup_table pass over the same rows in the same
+    order, knowing only the IDs it dropped
+
+    The first row of each dropped ID is kept and later ones are removed,
+    so a second read of a file needs memory for its duplicates only, not
+    for every ID. seen is a set shared by all batches of the pass.
+    """
+
+    if not dropped:
+        return table
+
+    keep = []
+    for i, tid in enumerate(table['columns']['TransactionID']):
+        if tid in dropped:
+            if tid in seen:
+                continue
+            seen.add(tid)
+        keep.append(i)
+
+    if len(keep) == table['row_count']:
+        return table
+    return take_rows(table, keep)
+
+
+def dedup_to_dict(state):
+    """
+    JSON-ready form of the state, e.g. for the incremental checkpoint
+
+    Bloom spill rows are committed first and tagged with the current run,
+    so dedup_from_dict can drop rows a crashed later run left behind.
+    """
+
+    if state['mode'] == 'exact':
+        return {
+            'mode': 'exact',
+            'ids': base64.b64encode(bytes(state['ids'])).decode('ascii'),
+            'ends': base64.b64encode(state['ends'].tobytes()).decode('ascii')
+        }
+
+    _flush(state)
+    state['connection'].commit()
+    return {
+        'mode': 'bloom',
+        'bits': base64.b64encode(bytes(state['bits'])).decode('ascii'),
+        'num_bits': state['num_bits'],
+        'num_hashes': state['num_hashes'],
+        'count': state['count'],
+        'spill_file': state['spill_file'],
+        'run': state['run']
+    }
+
+
+def dedup_from_dict(data):
+    """
+    Rebuilds a state saved with dedup_to_dict
+    """
+
+    if data['mode'] == 'exact':
+        state = _new_exact()
+        ids = base64.b64decode(data['ids'])
+        ends = array('Q')
+        ends.frombytes(base64.b64decode(data['ends']))
+        start = 0
+        for end in ends:
+            _exact_add(state, ids[start:end].decode('utf-8'))
+            start = end
+        return state
+
+    connection = _open_spill(data['spill_file'])
+    connection.execute('DELETE FROM transaction_ids WHERE run > ?', (data['run'],))
+    connection.commit()
+
+    return {
+        'mode': 'bloom',
+        'bits': bytearray(base64.b64decode(data['bits'])),
+        'num_bits': data['num_bits'],
+        'num_hashes': data['num_hashes'],
+        'count': data['count'],
+        'spill_file': data['spill_file'],
+        'temporary': False,
+        'connection': connection,
+        'pending': set(),
+        'run': data['run'] + 1
+    }
+
+
+def close_deduper(state):
+    """
+    Commits and closes the Bloom spill, removing it if it was a
+    temporary file (a no-op in exact mode)
+    """
+
+    if state['mode'] == 'bloom':
+        _flush(state)
+        state['connection'].commit()
+        state['connection'].close()
+        if state['temporary']:
+            os.remove(state['spill_file'])
@@ -1,59 +1,405 @@
-<<<<<<< HEAD
-def read_sales_file(file_path):
-=======
-# utils/file_handler.py
+import bz2
+import codecs
+import glob
+import gzip
+import io
+import json
+import lzma
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from contextlib import contextmanager
+
+from utils.instrumentation import instrumented
+from utils.dedup import as_deduper, close_deduper, dedup_records
+
+
+# Tried in order; latin-1 accepts any bytes so it always matches last
+CANDIDATE_ENCODINGS = ("utf-8", "latin-1")
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+COMPRESSED_OPENERS = {
+    ".gz": gzip.open,
+    ".bz2": bz2.open,
+    ".xz": lzma.open
+}
+BLOCK_SIZE = 1024 * 1024
+READ_AHEAD_BLOCKS = 4
+
+
+@contextmanager
+def map_file(file_path):
+    """
+    Memory-maps a file read-only for the duration of the with block
+
+    Pages are loaded by the OS on demand, so even multi-GB files are not
+    read up front. An empty file (which cannot be mapped) gives b"".
+    """
+
+    with open(file_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+def detect_encoding(data, sample_size=ENCODING_SAMPLE_SIZE):
+    """
+    Picks the encoding of a buffer (bytes or mmap) from samples of its
+    start and end, without decoding the rest
+
+    Returns: 'utf-8-sig' if there is a UTF-8 BOM, otherwise the first of
+    CANDIDATE_ENCODINGS that decodes both samples
+    """
+
+    if data[:3] == codecs.BOM_UTF8:
+        return "utf-8-sig"
+
+    head = data[:sample_size]
+    # Start the tail sample on a line boundary so no character is cut
+    tail_start = max(len(head), len(data) - sample_size)
+    newline = data.find(b"\n", tail_start)
+    tail = data[newline + 1:] if newline != -1 else b""
+
+    for encoding in CANDIDATE_ENCODINGS:
+        try:
+            # Incremental decoding tolerates a character cut at the sample end
+            codecs.getincrementaldecoder(encoding)().decode(head)
+            codecs.getincrementaldecoder(encoding)().decode(tail)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+
+    return "latin-1"
+
+def is_compressed(file_path):
+    """
+    Checks whether a path is a .gz, .bz2 or .xz file
+    """
+
+    return os.path.splitext(file_path)[1].lower() in COMPRESSED_OPENERS
+
+def expand_input_paths(paths):
+    """
+    Expands a path or glob pattern (or a list of them) into file paths
+
+    Glob matches are sorted; order across arguments and plain paths is
+    kept, and a path listed twice is only read once. A plain path that
+    does not exist is kept so opening it reports the error.
+    """
+
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+
+    result = []
+    for path in paths:
+        path = os.fspath(path)
+        if any(char in path for char in "*?["):
+            matches = sorted(glob.glob(path))
+            if not matches:
+                print(f"Warning: no files match {path}")
+            result.extend(matches)
+        else:
+            result.append(path)
+
+    return list(dict.fromkeys(result))
+
+def detect_file_encoding(file_path):
+    """
+    Detects a file's encoding from mapped samples (see detect_encoding),
+    or from the first decompressed block of a compressed file
+    """
+
+    if is_compressed(file_path):
+        with COMPRESSED_OPENERS[os.path.splitext(file_path)[1].lower()](file_path, "rb") as file:
+            return detect_encoding(file.read(ENCODING_SAMPLE_SIZE))
+
+    with map_file(file_path) as mapped:
+        return detect_encoding(mapped)
+
+def iter_decompressed_blocks(file_path, block_size=BLOCK_SIZE, read_ahead=READ_AHEAD_BLOCKS):
+    """
+    Yields the decompressed contents of a .gz/.bz2/.xz file in blocks
+
+    A background thread decompresses up to read_ahead blocks ahead of the
+    consumer (zlib, bz2 and lzma release the GIL while they work), so
+    decompression overlaps parsing instead of going to disk first.
+    """
+
+    opener = COMPRESSED_OPENERS[os.path.splitext(file_path)[1].lower()]
+    blocks = queue.Queue(maxsize=read_ahead)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up if the consumer went away, instead of blocking forever
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def produce():
+        try:
+            with opener(file_path, "rb") as file:
+                while not stop.is_set():
+                    block = file.read(block_size)
+                    if not block:
+                        break
+                    put(block)
+        except Exception as e:
+            put(e)
+        finally:
+            put(None)
+
+    reader = threading.Thread(target=produce, name="decompress-" + os.path.basename(file_path), daemon=True)
+    reader.start()
+
+    try:
+        while True:
+            block = blocks.get()
+            if block is None:
+                break
+            if isinstance(block, Exception):
+                raise block
+            yield block
+    finally:
+        stop.set()
+        reader.join()
+
+def iter_compressed_line_blocks(file_path, block_size=BLOCK_SIZE):
+    """
+    Yields decompressed blocks that end on line boundaries, so no line
+    (or CRLF pair) is split across blocks
+    """
+
+    pending = b""
+    for block in iter_decompressed_blocks(file_path, block_size):
+        block = pending + block
+        cut = block.rfind(b"\n") + 1
+        pending = block[cut:]
+        if cut:
+            yield block[:cut]
+
+    if pending:
+        yield pending
 
-def read_sales_file(file_path):
+def decode_bytes(raw, encoding):
+    """
+    Decodes bytes (or a memoryview) with the detected encoding
+    """
+
+    try:
+        return str(raw, encoding)
+    except UnicodeDecodeError:
+        # Outside the sampled regions the guess can be wrong; latin-1 never fails
+        return str(raw, "latin-1")
+
+def _decode_block(block, encoding):
+    try:
+        return str(block, encoding)
+    except UnicodeDecodeError:
+        # Fall back line by line so one bad byte doesn't affect the rest
+        return "".join(decode_bytes(line, encoding) for line in bytes(block).splitlines(True))
+
+def iter_mapped_lines(file_path, encoding=None, block_size=1024 * 1024):
+    """
+    Lazily yields the lines of a memory-mapped file as strings
+
+    The encoding is detected once from a sample unless given. The mapping
+    is decoded a block at a time straight from a memoryview, so the file
+    is never copied into bytes objects or held in memory as a whole.
+    Newlines are translated as in text mode.
+    """
+
+    with map_file(file_path) as mapped:
+        if encoding is None:
+            encoding = detect_encoding(mapped)
+
+        view = memoryview(mapped)
+        try:
+            size = len(mapped)
+            start = 0
+            while start < size:
+                end = min(start + block_size, size)
+                if end < size:
+                    # Blocks end after a \n, so no line (or \r\n) is split
+                    cut = mapped.rfind(b"\n", start, end)
+                    if cut == -1:
+                        cut = mapped.find(b"\n", end)
+                    end = size if cut == -1 else cut + 1
+
+                yield from io.StringIO(_decode_block(view[start:end], encoding), newline=None)
+                start = end
+        finally:
+            # The mapping cannot be closed while a view of it is alive
+            view.release()
+
+def iter_compressed_lines(file_path, encoding=None):
+    """
+    Lazily yields the lines of a .gz/.bz2/.xz file as strings, decoded
+    as they are decompressed
+
+    The encoding is detected once from the first block unless given.
+    """
+
+    for block in iter_compressed_line_blocks(file_path):
+        if encoding is None:
+            encoding = detect_encoding(block)
+        yield from io.StringIO(_decode_block(block, encoding), newline=None)
+
+def iter_file_lines(file_path, encoding=None):
+    """
+    Lazily yields the lines of a plain (memory-mapped) or compressed file
+    """
+
+    if is_compressed(file_path):
+        return iter_compressed_lines(file_path, encoding)
+    return iter_mapped_lines(file_path, encoding)
+
+def iter_input_lines(paths, encoding=None):
+    """
+    Lazily yields the lines of one or more inputs (paths or globs, see
+    expand_input_paths) as if they were one file
+
+    Only the first file's header line is kept.
+    """
+
+    for index, path in enumerate(expand_input_paths(paths)):
+        lines = iter_file_lines(path, encoding)
+        if index:
+            next(lines, None)
+        yield from lines
+
+@instrumented()
+def read_sales_file(file_path, encoding=None):
     """
     Reads the sales data file and returns all lines
+
+    file_path may also be a glob or a list of files, plain or .gz/.bz2/.xz.
+    The encoding is detected from each file unless given.
     """
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
     try:
-        with open(file_path, "r", encoding="latin-1") as file:
-            lines = file.readlines()
-        return lines
+        return list(iter_input_lines(file_path, encoding))
     except Exception as e:
-<<<<<<< HEAD
         print("Error reading file:", e)
         return []
-    
-def read_sales_data(filename):
+
+def iter_sales_file(file_path, encoding=None):
     """
-    Reads sales data from file handling encoding issues
+    Lazily yields lines from the sales data file one at a time
 
-    Returns: list of raw lines (strings)
+    Unlike read_sales_file, the file is never loaded into memory as a whole,
+    so memory use stays flat regardless of file size. Plain files are
+    memory-mapped and compressed ones are decompressed in a background
+    thread; globs and lists of files are read one after another.
     """
+    try:
+        yield from iter_input_lines(file_path, encoding)
+    except Exception as e:
+        print("Error reading file:", e)
 
-    encodings = ['utf-8', 'latin-1', 'cp1252']
+def iter_lines_from_offset(file_path, offset=0, position=None, encoding="latin-1"):
+    """
+    Lazily yields complete lines appended after a byte offset
 
-    for encoding in encodings:
-        try:
-            with open(filename, 'r', encoding=encoding) as file:
-                lines = file.readlines()
+    A trailing line without a newline may still be being written, so it is
+    left for the next run. position['offset'] (if a dict is given) is kept
+    at the byte offset just past the last line yielded. Lines that don't
+    decode with the given encoding fall back to latin-1 (see decode_bytes).
+    """
 
-            # Remove header (first line)
-            data_lines = lines[1:]
+    if position is None:
+        position = {}
+    position["offset"] = offset
 
-            # Remove empty lines and strip whitespace
-            cleaned_lines = []
-            for line in data_lines:
-                line = line.strip()
-                if line:
-                    cleaned_lines.append(line)
+    try:
+        with open(file_path, "rb") as file:
+            file.seek(offset)
+            for raw in file:
+                if not raw.endswith(b"\n"):
+                    break
+                line = decode_bytes(raw, encoding)
+                position["offset"] += len(raw)
+                yield line
+    except Exception as e:
+        print("Error reading file:", e)
 
-            return cleaned_lines
+def split_file_ranges(file_path, parts):
+    """
+    Splits a file into at most `parts` byte ranges that start and end
+    on line boundaries
 
-        except UnicodeDecodeError:
-            # Try next encoding
-            continue
+    Returns: list of (start, end) offsets covering the whole file
+    """
 
-        except FileNotFoundError:
-            print(f"Error: File not found -> {filename}")
-            return []
+    size = os.path.getsize(file_path)
+    parts = max(1, parts)
+    boundaries = [0]
 
-    print("Error: Unable to read file with supported encodings.")
-    return [] 
+    with open(file_path, "rb") as file:
+        for i in range(1, parts):
+            position = size * i // parts
+            if position <= boundaries[-1]:
+                continue
 
+            # Move to the start of the next line after position - 1
+            file.seek(position - 1)
+            file.readline()
+            position = file.tell()
+
+            if boundaries[-1] < position < size:
+                boundaries.append(position)
+
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def read_raw_range(file_path, start, end):
+    """
+    Reads the undecoded bytes in the byte range [start, end)
+    """
+
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        return file.read(end - start)
+
+@instrumented()
+def read_sales_data(filename):
+    """
+    Reads sales data from file handling encoding issues
+
+    The encoding is detected once from a sample of the mapped file
+    instead of re-reading the whole file for each candidate. filename may
+    also be a glob or a list of plain or .gz/.bz2/.xz files.
+
+    Returns: list of raw lines (strings)
+    """
+
+    try:
+        lines = iter_input_lines(filename)
+
+        # Remove header (first line)
+        next(lines, None)
+
+        # Remove empty lines and strip whitespace
+        cleaned_lines = []
+        for line in lines:
+            line = line.strip()
+            if line:
+                cleaned_lines.append(line)
+
+        return cleaned_lines
+
+    except FileNotFoundError:
+        print(f"Error: File not found -> {filename}")
+        return []
+
+@instrumented()
 def parse_transactions(raw_lines):
     """
     Parses raw lines into clean list of dictionaries
@@ -107,9 +453,14 @@ def parse_transactions(raw_lines):
 
 
 
-def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None):
+@instrumented(rows=lambda result: len(result[0]))
+def validate_and_filter(transactions, region=None, min_amount=None, max_amount=None, dedup='exact'):
     """
     Validates transactions and applies optional filters
+
+    Valid rows repeating an earlier TransactionID are dropped and counted
+    as 'duplicates' in the summary (dedup: a mode or state from
+    utils.dedup, or None to keep them).
     """
 
     valid_transactions = []
@@ -127,6 +478,7 @@ def validate_and_filter(transactions, region=None, min_amount=None, max_amount=N
 
     filtered_by_region = 0
     filtered_by_amount = 0
+    validated = []
 
     for t in transactions:
         # Validation rules
@@ -140,6 +492,16 @@ def validate_and_filter(transactions, region=None, min_amount=None, max_amount=N
             invalid_count += 1
             continue
 
+        validated.append(t)
+
+    dedup_stats = {'duplicates': 0}
+    deduper, owned = as_deduper(dedup)
+    if deduper is not None:
+        validated = dedup_records(deduper, validated, dedup_stats)
+        if owned:
+            close_deduper(deduper)
+
+    for t in validated:
         amount = t['Quantity'] * t['UnitPrice']
 
         # Region filter
@@ -161,13 +523,261 @@ def validate_and_filter(transactions, region=None, min_amount=None, max_amount=N
     summary = {
         'total_input': total_input,
         'invalid': invalid_count,
+        'duplicates': dedup_stats['duplicates'],
         'filtered_by_region': filtered_by_region,
         'filtered_by_amount': filtered_by_amount,
         'final_count': len(valid_transactions)
     }
 
     return valid_transactions, invalid_count, summary
-=======
-        print(f"Error reading file: {e}")
-        return []
->>>>>>> da7096e53b506bdeeb6a64d34660de5dfa576334
+
+
+ENRICHED_MAGIC = b"SALESCOL"
+ENRICHED_VERSION = 2
+ENRICHED_CHUNK_ROWS = 65536
+# Columns with more distinct values than this share of a chunk's rows
+# (e.g. TransactionID) are stored plain instead of dictionary-encoded
+DICTIONARY_MAX_RATIO = 0.5
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+
+def _column_type(values):
+    """
+    Picks the storage type for a chunk of one column
+
+    Integers outside the int64 range fit neither numeric array, so their
+    chunks go through the dictionary/plain path like any other value.
+    """
+
+    if not all(INT64_MIN <= v <= INT64_MAX for v in values if type(v) is int):
+        return "dict"
+    if all(type(v) is int for v in values):
+        return "int64"
+    if all(type(v) in (int, float) for v in values):
+        return "float64"
+    return "dict"
+
+
+def _write_blob(f, data, compress):
+    """
+    Writes one (optionally zlib-compressed) blob and returns its location
+    """
+
+    compressed = False
+    if compress:
+        packed = zlib.compress(data, 1)
+        if len(packed) < len(data):
+            data = packed
+            compressed = True
+
+    location = {"offset": f.tell(), "length": len(data), "compressed": compressed}
+    f.write(data)
+    return location
+
+
+def _write_column(f, values, compress):
+    """
+    Writes one column chunk to f
+
+    Returns: footer metadata with its type and the location of its data
+    (and, for dictionary-encoded columns, of the dictionary)
+    """
+
+    column_type = _column_type(values)
+    dictionary = None
+
+    if column_type == "int64":
+        payload = array("q", values)
+    elif column_type == "float64":
+        payload = array("d", values)
+    else:
+        index = {}
+        dictionary = []
+        codes = array("I")
+        try:
+            for value in values:
+                # Keyed by type too, so True and 1 stay distinct values
+                key = (type(value), value)
+                code = index.get(key)
+                if code is None:
+                    code = index[key] = len(dictionary)
+                    dictionary.append(value)
+                codes.append(code)
+            unhashable = False
+        except TypeError:
+            # e.g. list or dict API fields
+            unhashable = True
+
+        if unhashable or len(dictionary) > len(values) * DICTIONARY_MAX_RATIO:
+            # Unhashable, or mostly unique so a dictionary would just
+            # repeat the values: store the values themselves
+            column_type = "plain"
+            dictionary = None
+            payload = None
+        else:
+            payload = codes
+
+    if payload is None:
+        data = json.dumps(values).encode("utf-8")
+    else:
+        # The file format is little-endian regardless of platform
+        if sys.byteorder == "big":
+            payload.byteswap()
+        data = payload.tobytes()
+
+    meta = {"type": column_type}
+    meta.update(_write_blob(f, data, compress))
+    if dictionary is not None:
+        meta["dictionary"] = _write_blob(f, json.dumps(dictionary).encode("utf-8"), compress)
+    return meta
+
+
+def write_enriched_data(records, file_path, chunk_rows=ENRICHED_CHUNK_ROWS, compress=True):
+    """
+    Writes transaction dicts to a compact, chunked columnar binary file
+
+    Each chunk of rows stores every column separately: integers and floats
+    as raw 64-bit arrays, repetitive values as codes plus a dictionary,
+    mostly-unique values plain, all optionally zlib-compressed. A JSON
+    footer records where each column chunk lives, so readers can load just
+    the columns they need. Columns are the keys of all records, in order
+    of first appearance; a record without a key stores None.
+
+    Returns: number of rows written
+    """
+
+    column_names = {}
+    row_groups = []
+    total_rows = 0
+
+    with open(file_path, "wb") as f:
+        f.write(ENRICHED_MAGIC)
+
+        def flush(chunk):
+            group = {"rows": len(chunk), "columns": {}}
+            for name in column_names:
+                group["columns"][name] = _write_column(f, [row.get(name) for row in chunk], compress)
+            row_groups.append(group)
+
+        chunk = []
+        for record in records:
+            for name in record:
+                if name not in column_names:
+                    column_names[name] = None
+            chunk.append(record)
+            if len(chunk) >= chunk_rows:
+                flush(chunk)
+                total_rows += len(chunk)
+                chunk = []
+
+        if chunk:
+            flush(chunk)
+            total_rows += len(chunk)
+
+        footer = json.dumps({
+            "version": ENRICHED_VERSION,
+            "columns": list(column_names),
+            "row_count": total_rows,
+            "row_groups": row_groups
+        }).encode("utf-8")
+
+        f.write(footer)
+        f.write(struct.pack("<Q", len(footer)))
+        f.write(ENRICHED_MAGIC)
+
+    return total_rows
+
+
+def _read_footer(mapped):
+    tail = len(ENRICHED_MAGIC) + 8
+    if mapped[:len(ENRICHED_MAGIC)] != ENRICHED_MAGIC or mapped[-len(ENRICHED_MAGIC):] != ENRICHED_MAGIC:
+        raise ValueError("Not an enriched sales data file")
+
+    (footer_length,) = struct.unpack("<Q", mapped[-tail:-len(ENRICHED_MAGIC)])
+    footer = json.loads(mapped[-tail - footer_length:-tail].decode("utf-8"))
+
+    if footer["version"] != ENRICHED_VERSION:
+        raise ValueError(f"Unsupported enriched data version: {footer['version']}")
+
+    return footer
+
+
+def _read_blob(mapped, location):
+    data = mapped[location["offset"]:location["offset"] + location["length"]]
+    if location["compressed"]:
+        data = zlib.decompress(data)
+    return data
+
+
+def _decode_column(mapped, meta, rows):
+    if meta is None:
+        # Column first seen in a later chunk
+        return [None] * rows
+
+    data = _read_blob(mapped, meta)
+    if meta["type"] == "plain":
+        return json.loads(data.decode("utf-8"))
+
+    typecode = {"int64": "q", "float64": "d", "dict": "I"}[meta["type"]]
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+
+    if meta["type"] == "dict":
+        dictionary = json.loads(_read_blob(mapped, meta["dictionary"]).decode("utf-8"))
+        return [dictionary[code] for code in values]
+    return values
+
+
+def iter_enriched_chunks(file_path, columns=None):
+    """
+    Memory-maps an enriched data file and yields one dict of
+    column name -> values per row group, decoding only `columns`
+    """
+
+    with open(file_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            footer = _read_footer(mapped)
+            names = footer["columns"] if columns is None else list(columns)
+
+            missing = set(names) - set(footer["columns"])
+            if missing:
+                raise KeyError(f"Columns not in file: {', '.join(sorted(missing))}")
+
+            for group in footer["row_groups"]:
+                yield {
+                    name: _decode_column(mapped, group["columns"].get(name), group["rows"])
+                    for name in names
+                }
+
+
+def read_enriched_data(file_path, columns=None):
+    """
+    Loads selected columns of an enriched data file
+
+    Returns: dict of column name -> list of values (all columns by default)
+    """
+
+    result = None
+    for chunk in iter_enriched_chunks(file_path, columns):
+        if result is None:
+            result = {name: [] for name in chunk}
+        for name, values in chunk.items():
+            result[name].extend(values)
+
+    if result is None:
+        result = {name: [] for name in (columns or [])}
+    return result
+
+
+def iter_enriched_rows(file_path, columns=None):
+    """
+    Yields the records of an enriched data file as dicts
+    """
+
+    for chunk in iter_enriched_chunks(file_path, columns):
+        names = list(chunk)
+        for row in zip(*(chunk[name] for name in names)):
+            yield dict(zip(names, row))
@@ -0,0 +1,147 @@
+import json
+import os
+
+from utils.api_handler import lookup_products
+from utils.aggregator import new_aggregates, update_aggregates, aggregates_to_dict, aggregates_from_dict
+from utils.data_processor import stream_valid_records
+from utils.dedup import new_deduper, dedup_to_dict, dedup_from_dict, close_deduper
+from utils.file_handler import iter_lines_from_offset, detect_file_encoding
+from utils.report_generator import generate_sales_report
+
+
+STATE_VERSION = 3
+
+
+def new_state(dedup='exact', spill_file=None):
+    """
+    Creates an empty incremental state (nothing ingested yet)
+
+    dedup picks how ingested TransactionIDs are remembered (see
+    utils.dedup); spill_file is where 'bloom' mode keeps its exact list.
+    """
+
+    return {
+        'version': STATE_VERSION,
+        'offset': 0,
+        'encoding': None,
+        'aggregates': new_aggregates(),
+        'dedup': new_deduper(dedup, spill_file=spill_file),
+        'stats': {'total': 0, 'invalid': 0, 'duplicates': 0}
+    }
+
+
+def load_state(state_file, dedup='exact'):
+    """
+    Loads the persisted aggregate state, or a fresh one if there is none
+
+    The dedup mode only applies to a fresh state; a persisted one keeps
+    the mode it was created with.
+    """
+
+    spill_file = state_file + '.ids.sqlite'
+
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return new_state(dedup, spill_file)
+
+    if data.get('version') != STATE_VERSION:
+        print("State file format changed, rebuilding from scratch")
+        return new_state(dedup, spill_file)
+
+    return {
+        'version': STATE_VERSION,
+        'offset': data['offset'],
+        'encoding': data.get('encoding'),
+        'aggregates': aggregates_from_dict(data['aggregates']),
+        'dedup': dedup_from_dict(data['dedup']),
+        'stats': data['stats']
+    }
+
+
+def save_state(state, state_file):
+    """
+    Persists the state atomically so a crash never leaves a torn file
+    """
+
+    data = {
+        'version': STATE_VERSION,
+        'offset': state['offset'],
+        'encoding': state['encoding'],
+        'aggregates': aggregates_to_dict(state['aggregates']),
+        'dedup': dedup_to_dict(state['dedup']),
+        'stats': state['stats']
+    }
+
+    tmp_file = state_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_file, state_file)
+
+
+def ingest_new_rows(state, data_file, encoding=None):
+    """
+    Folds rows appended to data_file since the last checkpoint into state
+
+    Transactions whose ID has already been ingested are skipped.
+    If the file is now smaller than the checkpoint it was replaced,
+    so the state is rebuilt from the start of the file. The encoding is
+    detected on the first run and kept in the state, so later runs
+    decode appended rows the same way.
+
+    Returns: stats for this run (total, invalid, duplicates, new)
+    """
+
+    if os.path.getsize(data_file) < state['offset']:
+        print("Data file was truncated or replaced, rebuilding state")
+        dedup = state['dedup']
+        close_deduper(dedup)
+        state.update(new_state(dedup['mode'], dedup.get('spill_file')))
+
+    encoding = encoding or state['encoding'] or detect_file_encoding(data_file)
+    state['encoding'] = encoding
+
+    start = state['offset']
+    position = {}
+    run_stats = {'total': 0, 'invalid': 0, 'duplicates': 0, 'new': 0}
+    aggregates = state['aggregates']
+
+    lines = iter_lines_from_offset(data_file, start, position, encoding)
+    chunks = stream_valid_records(
+        lines, stats=run_stats, skip_header=(start == 0), dedup=state['dedup']
+    )
+    for chunk in chunks:
+        update_aggregates(aggregates, chunk)
+        run_stats['new'] += len(chunk)
+
+    state['offset'] = position.get('offset', start)
+    for key in ('total', 'invalid', 'duplicates'):
+        state['stats'][key] += run_stats[key]
+
+    return run_stats
+
+
+def run_incremental(data_file, state_file, product_map, output_file='output/sales_report.txt',
+                    dedup='exact'):
+    """
+    Ingests only the new rows of data_file, checkpoints the aggregate
+    state and re-renders the report from it
+
+    dedup='bloom' bounds the memory used to remember ingested
+    TransactionIDs, at the cost of an SQLite file next to state_file.
+    """
+
+    state = load_state(state_file, dedup)
+    try:
+        run_stats = ingest_new_rows(state, data_file)
+        save_state(state, state_file)
+    finally:
+        close_deduper(state['dedup'])
+
+    aggregates = state['aggregates']
+    product_info = lookup_products(sorted(aggregates['product_ids']), product_map)
+    enriched_products = {pid: info for pid, info in product_info.items() if info}
+    generate_sales_report(None, enriched_products, output_file, aggregates=aggregates)
+
+    return run_stats
@@ -0,0 +1,133 @@
+import functools
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+# The run currently being recorded, if any (see start_run)
+_active_run = None
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (None if unknown)
+    """
+
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 2)
+
+
+def start_run():
+    """
+    Starts recording a run; stages and instrumented functions called
+    afterwards are added to the returned summary
+    """
+
+    global _active_run
+    _active_run = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "stages": [],
+        "_depth": 0
+    }
+    return _active_run
+
+
+def finish_run(summary, output_file=None):
+    """
+    Stops recording and optionally writes the summary as JSON
+
+    Returns: the summary without internal bookkeeping
+    """
+
+    global _active_run
+    if _active_run is summary:
+        _active_run = None
+
+    result = {key: value for key, value in summary.items() if not key.startswith("_")}
+    result["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    result["total_wall_seconds"] = round(
+        sum(s["wall_seconds"] for s in summary["stages"] if s["depth"] == 0), 6
+    )
+    result["peak_rss_mb"] = peak_rss_mb()
+
+    if output_file:
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    return result
+
+
+@contextmanager
+def stage(name, rows=None, summary=None):
+    """
+    Times a block of work and records it in the run summary
+
+    Yields the stage record; set record["rows"] inside the block if the
+    row count is only known afterwards.
+    """
+
+    summary = summary if summary is not None else _active_run
+    record = {"name": name, "rows": rows}
+
+    if summary is None:
+        yield record
+        return
+
+    record["depth"] = summary["_depth"]
+    summary["_depth"] += 1
+    summary["stages"].append(record)
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+
+    try:
+        yield record
+    finally:
+        wall = time.perf_counter() - start_wall
+        summary["_depth"] -= 1
+
+        record["wall_seconds"] = round(wall, 6)
+        record["cpu_seconds"] = round(time.process_time() - start_cpu, 6)
+        record["rows_per_sec"] = round(record["rows"] / wall) if record["rows"] and wall else None
+        record["peak_rss_mb"] = peak_rss_mb()
+
+
+def instrumented(name=None, rows=len):
+    """
+    Decorator recording each call as a stage while a run is active
+
+    rows is applied to the return value to count processed rows;
+    pass None when the result has no meaningful length.
+    """
+
+    def decorator(func):
+        stage_name = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active_run is None:
+                return func(*args, **kwargs)
+
+            with stage(stage_name) as record:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    try:
+                        record["rows"] = rows(result)
+                    except TypeError:
+                        pass
+                return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,273 @@
+import re
+from datetime import date as _date
+from functools import lru_cache
+
+from utils.columnar import new_table, append_transactions
+from utils.file_handler import (
+    map_file, detect_encoding, decode_bytes, expand_input_paths, is_compressed,
+    iter_compressed_line_blocks
+)
+
+
+# A well-formed valid line: TransactionID starting with T, 8 fields, a plain
+# integer quantity, a price with optional thousands separators, non-empty
+# CustomerID/Region and no surrounding whitespace. Any other line goes
+# through parse_sales_line, so the validation rules stay identical.
+VALID_LINE = re.compile(
+    rb"(T[^|]*)\|([^|]*)\|([^|]*)\|([^|]*)\|([0-9]{1,18})\|"
+    rb"([0-9][0-9,]*(?:\.[0-9]+)?)\|([^|]+)\|([^|]*[!-{}~])"
+)
+
+DEFAULT_BUFFER_SIZE = 8 * 1024 * 1024
+
+# Quantities are stored in a signed 64-bit array column (columnar 'q')
+MAX_QUANTITY = 2 ** 63 - 1
+
+
+@lru_cache(maxsize=4096)
+def is_valid_date(value):
+    """
+    Checks for a real calendar date written as YYYY-MM-DD
+
+    Only this form is accepted because dates are compared and range-
+    filtered as strings; other ISO forms (20241201, 2024-W01-1) are not.
+    """
+
+    if len(value) != 10 or value[4] != "-" or value[7] != "-":
+        return False
+    try:
+        _date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def parse_sales_line(line):
+    """
+    Parses and validates a single stripped data line
+
+    Returns: transaction dict, or None if the line is invalid
+    """
+
+    parts = line.split("|")
+    if len(parts) != 8:
+        return None
+
+    (
+        transaction_id,
+        date,
+        product_id,
+        product_name,
+        quantity,
+        unit_price,
+        customer_id,
+        region
+    ) = parts
+
+    if not transaction_id.startswith("T"):
+        return None
+
+    if not customer_id or not region:
+        return None
+
+    if not is_valid_date(date):
+        return None
+
+    try:
+        quantity = int(quantity)
+        unit_price = float(unit_price.replace(",", ""))
+    except ValueError:
+        return None
+
+    if quantity <= 0 or quantity > MAX_QUANTITY or unit_price <= 0:
+        return None
+
+    return {
+        "TransactionID": transaction_id,
+        "Date": date,
+        "ProductID": product_id,
+        "ProductName": product_name.replace(",", ""),
+        "Quantity": quantity,
+        "UnitPrice": unit_price,
+        "CustomerID": customer_id,
+        "Region": region
+    }
+
+
+def _column_encoder(column, decode, validate=None):
+    """
+    Returns (codes.append, cache, encode) for filling one encoded column
+    from raw bytes; encode(raw) decodes a value the first time it is seen
+
+    Values failing validate are cached as None instead of a code.
+    """
+
+    index = column["index"]
+    values = column["values"]
+    cache = {}
+
+    def encode(raw):
+        value = decode(raw)
+        if validate is not None and not validate(value):
+            cache[raw] = None
+            return None
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(values)
+            values.append(value)
+        cache[raw] = code
+        return code
+
+    return column["codes"].append, cache, encode
+
+
+def parse_buffer(data, table=None, stats=None, encoding="latin-1", skip_header=False):
+    """
+    Parses and validates a whole buffer of pipe-delimited lines (bytes)
+    straight into a columnar table
+
+    Accepts exactly the rows parse_sales_line accepts, but without building
+    a dict per row or raising an exception per bad field: well-formed lines
+    are split by one compiled regex, and only irregular lines are decoded
+    and parsed the slow way. Each distinct Date, ProductID, ProductName,
+    CustomerID and Region is decoded once per buffer.
+
+    Returns: the table (a new one unless one is given to append to)
+    """
+
+    if table is None:
+        table = new_table()
+    if stats is None:
+        stats = {}
+    stats.setdefault("total", 0)
+    stats.setdefault("invalid", 0)
+
+    columns = table["columns"]
+    add_transaction_id = columns["TransactionID"].append
+    add_quantity = columns["Quantity"].append
+    add_price = columns["UnitPrice"].append
+
+    def decode(raw):
+        return decode_bytes(raw, encoding)
+
+    def decode_name(raw):
+        return decode_bytes(raw, encoding).replace(",", "")
+
+    add_date, dates, encode_date = _column_encoder(columns["Date"], decode, is_valid_date)
+    add_product_id, product_ids, encode_product_id = _column_encoder(columns["ProductID"], decode)
+    add_name, names, encode_name = _column_encoder(columns["ProductName"], decode_name)
+    add_customer, customers, encode_customer = _column_encoder(columns["CustomerID"], decode)
+    add_region, regions, encode_region = _column_encoder(columns["Region"], decode)
+
+    match = VALID_LINE.fullmatch
+    total = invalid = rows = 0
+
+    # bytes.splitlines splits on the same \n, \r\n and \r as text mode
+    lines = data.splitlines()
+    if skip_header and lines:
+        del lines[0]
+
+    for line in lines:
+        m = match(line)
+
+        if m is None:
+            # Irregular line: decode it and fall back to the reference parser
+            text = decode_bytes(line, encoding).strip()
+            if not text:
+                continue
+            total += 1
+            record = parse_sales_line(text)
+            if record is None:
+                invalid += 1
+            else:
+                append_transactions(table, (record,))
+            continue
+
+        total += 1
+        tid, day, pid, name, qty, price, cid, region = m.groups()
+
+        # The regex only admits digits, so zero is the only invalid value left
+        quantity = int(qty)
+        unit_price = float(price.replace(b",", b"")) if b"," in price else float(price)
+        if not quantity or not unit_price:
+            invalid += 1
+            continue
+
+        date_code = dates[day] if day in dates else encode_date(day)
+        if date_code is None:
+            invalid += 1
+            continue
+
+        add_transaction_id(decode(tid))
+        add_quantity(quantity)
+        add_price(unit_price)
+        add_date(date_code)
+        add_product_id(product_ids[pid] if pid in product_ids else encode_product_id(pid))
+        add_name(names[name] if name in names else encode_name(name))
+        add_customer(customers[cid] if cid in customers else encode_customer(cid))
+        add_region(regions[region] if region in regions else encode_region(region))
+        rows += 1
+
+    table["row_count"] += rows
+    stats["total"] += total
+    stats["invalid"] += invalid
+    return table
+
+
+def _iter_file_blocks(file_path, buffer_size, encoding):
+    """
+    Yields (encoding, block) for one plain or compressed file, with
+    blocks cut on line boundaries
+    """
+
+    if is_compressed(file_path):
+        for block in iter_compressed_line_blocks(file_path, buffer_size):
+            if encoding is None:
+                encoding = detect_encoding(block)
+            yield encoding, block
+        return
+
+    with map_file(file_path) as mapped:
+        if encoding is None:
+            encoding = detect_encoding(mapped)
+
+        size = len(mapped)
+        start = 0
+        while start < size:
+            end = min(start + buffer_size, size)
+            if end < size:
+                # Cut after the last \n so a \r\n pair is never split;
+                # a line longer than the block extends it
+                cut = mapped.rfind(b"\n", start, end)
+                if cut == -1:
+                    cut = mapped.find(b"\n", end)
+                end = size if cut == -1 else cut + 1
+
+            yield encoding, mapped[start:end]
+            start = end
+
+
+def iter_table_batches(file_path, buffer_size=DEFAULT_BUFFER_SIZE, stats=None, encoding=None):
+    """
+    Yields one columnar table per block of a sales file, cut on line
+    boundaries
+
+    file_path may also be a glob or a list of files (see
+    file_handler.expand_input_paths). Plain files are memory-mapped and
+    compressed (.gz/.bz2/.xz) ones decompressed in a background thread;
+    the encoding is detected once per file unless given. Each file's
+    header line is skipped. Memory is bounded by buffer_size plus one
+    batch, regardless of file size. Read errors (e.g. a missing file)
+    are raised, so a failed read is never mistaken for a short file.
+    """
+
+    if stats is None:
+        stats = {}
+    stats.setdefault("total", 0)
+    stats.setdefault("invalid", 0)
+
+    for path in expand_input_paths(file_path):
+        first = True
+        for block_encoding, block in _iter_file_blocks(path, buffer_size, encoding):
+            yield parse_buffer(block, stats=stats, encoding=block_encoding, skip_header=first)
+            first = False
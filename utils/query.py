@@ -0,0 +1,201 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from operator import mul
+
+from utils.columnar import is_table, table_from_transactions, take_rows
+
+
+def _postings(column):
+    """
+    Row ids per dictionary code of an encoded column
+    """
+
+    postings = [array('I') for _ in column['values']]
+    for row, code in enumerate(column['codes']):
+        postings[code].append(row)
+    return postings
+
+
+def build_index(transactions):
+    """
+    Builds secondary indexes over the loaded transactions
+
+    Region, ProductID and CustomerID map to row id lists, dates are kept
+    sorted with prefix row counts for range lookups, and transaction
+    amounts are kept sorted alongside their row ids.
+    """
+
+    table = transactions if is_table(transactions) else table_from_transactions(transactions)
+    columns = table['columns']
+
+    date_col = columns['Date']
+    date_postings = _postings(date_col)
+    date_order = sorted(range(len(date_col['values'])), key=date_col['values'].__getitem__)
+
+    date_counts = [0]
+    for code in date_order:
+        date_counts.append(date_counts[-1] + len(date_postings[code]))
+
+    amounts = [q * p for q, p in zip(columns['Quantity'], columns['UnitPrice'])]
+    amount_rows = sorted(range(len(amounts)), key=amounts.__getitem__)
+
+    return {
+        'table': table,
+        'amounts': amounts,
+        'by_region': _postings(columns['Region']),
+        'by_product': _postings(columns['ProductID']),
+        'by_customer': _postings(columns['CustomerID']),
+        'dates': [date_col['values'][code] for code in date_order],
+        'date_postings': [date_postings[code] for code in date_order],
+        'date_counts': date_counts,
+        'sorted_amounts': array('d', (amounts[i] for i in amount_rows)),
+        'amount_rows': array('I', amount_rows)
+    }
+
+
+def _lookup(index, name, key, value):
+    column = index['table']['columns'][name]
+    code = column['index'].get(value)
+    return index[key][code] if code is not None else array('I')
+
+
+def query_rows(index, region=None, start_date=None, end_date=None,
+               min_amount=None, max_amount=None, customer_id=None, product_id=None):
+    """
+    Finds the row ids matching every given filter (ranges are inclusive)
+
+    The most selective index is used to pick candidates, which are then
+    checked against the remaining filters, so the cost grows with the
+    size of the smallest matching set rather than the whole dataset.
+
+    Returns: sorted list of row ids
+    """
+
+    columns = index['table']['columns']
+
+    # Each candidate set is (row count, list of row id arrays)
+    candidates = []
+
+    if region is not None:
+        rows = _lookup(index, 'Region', 'by_region', region)
+        candidates.append((len(rows), [rows]))
+    if customer_id is not None:
+        rows = _lookup(index, 'CustomerID', 'by_customer', customer_id)
+        candidates.append((len(rows), [rows]))
+    if product_id is not None:
+        rows = _lookup(index, 'ProductID', 'by_product', product_id)
+        candidates.append((len(rows), [rows]))
+
+    if start_date is not None or end_date is not None:
+        dates = index['dates']
+        lo = bisect_left(dates, start_date) if start_date is not None else 0
+        hi = max(lo, bisect_right(dates, end_date) if end_date is not None else len(dates))
+        size = index['date_counts'][hi] - index['date_counts'][lo]
+        candidates.append((size, index['date_postings'][lo:hi]))
+
+    if min_amount is not None or max_amount is not None:
+        sorted_amounts = index['sorted_amounts']
+        lo = bisect_left(sorted_amounts, min_amount) if min_amount is not None else 0
+        hi = max(lo, bisect_right(sorted_amounts, max_amount) if max_amount is not None else len(sorted_amounts))
+        candidates.append((hi - lo, [index['amount_rows'][lo:hi]]))
+
+    if not candidates:
+        return list(range(index['table']['row_count']))
+
+    _, postings = min(candidates, key=lambda candidate: candidate[0])
+    rows = [row for posting in postings for row in posting]
+
+    region_code = columns['Region']['index'].get(region, -1)
+    customer_code = columns['CustomerID']['index'].get(customer_id, -1)
+    product_code = columns['ProductID']['index'].get(product_id, -1)
+    date_values = columns['Date']['values']
+    date_codes = columns['Date']['codes']
+    amounts = index['amounts']
+
+    result = []
+    for row in rows:
+        if region is not None and columns['Region']['codes'][row] != region_code:
+            continue
+        if customer_id is not None and columns['CustomerID']['codes'][row] != customer_code:
+            continue
+        if product_id is not None and columns['ProductID']['codes'][row] != product_code:
+            continue
+        if start_date is not None or end_date is not None:
+            date = date_values[date_codes[row]]
+            if (start_date is not None and date < start_date) or (end_date is not None and date > end_date):
+                continue
+        if min_amount is not None and amounts[row] < min_amount:
+            continue
+        if max_amount is not None and amounts[row] > max_amount:
+            continue
+        result.append(row)
+
+    result.sort()
+    return result
+
+
+def query_transactions(index, **filters):
+    """
+    Returns the matching transactions as a columnar table, which every
+    data_processor analytic and the report accept directly
+
+    Accepts the same filters as query_rows.
+    """
+
+    return take_rows(index['table'], query_rows(index, **filters))
+
+
+def filter_rows(transactions, region=None, start_date=None, end_date=None,
+                min_amount=None, max_amount=None, customer_id=None, product_id=None):
+    """
+    Finds the row ids matching every given filter (same filters as
+    query_rows) in a single scan, without building an index
+
+    Cheaper than build_index + query_rows when the data is only filtered
+    once, e.g. each batch of a streamed file. Dictionary-encoded columns
+    are tested once per distinct value, then rows only look up their code.
+
+    Returns: sorted list of row ids
+    """
+
+    table = transactions if is_table(transactions) else table_from_transactions(transactions)
+    columns = table['columns']
+    tests = []
+
+    for name, value in (('Region', region), ('CustomerID', customer_id), ('ProductID', product_id)):
+        if value is not None:
+            column = columns[name]
+            allowed = [v == value for v in column['values']]
+            tests.append(map(allowed.__getitem__, column['codes']))
+
+    if start_date is not None or end_date is not None:
+        column = columns['Date']
+        allowed = [
+            (start_date is None or date >= start_date) and (end_date is None or date <= end_date)
+            for date in column['values']
+        ]
+        tests.append(map(allowed.__getitem__, column['codes']))
+
+    if min_amount is not None or max_amount is not None:
+        low = min_amount if min_amount is not None else float('-inf')
+        high = max_amount if max_amount is not None else float('inf')
+        amounts = map(mul, columns['Quantity'], columns['UnitPrice'])
+        tests.append(low <= amount <= high for amount in amounts)
+
+    rows = range(table['row_count'])
+    if not tests:
+        return list(rows)
+    if len(tests) == 1:
+        return list(compress(rows, tests[0]))
+    return list(compress(rows, map(all, zip(*tests))))
+
+
+def filter_table(transactions, **filters):
+    """
+    Returns the matching transactions as a columnar table, like
+    query_transactions but with a single scan (see filter_rows)
+    """
+
+    table = transactions if is_table(transactions) else table_from_transactions(transactions)
+    return take_rows(table, filter_rows(table, **filters))
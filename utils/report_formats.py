@@ -0,0 +1,5 @@
+# Kept free of imports so the CLI can offer --format choices without
+# loading the report generator and the analytics behind it
+
+REPORT_FORMATS = ('text', 'csv', 'json', 'html')
+REPORT_EXTENSIONS = {'text': '.txt', 'csv': '.csv', 'json': '.json', 'html': '.html'}
@@ -1,28 +1,109 @@
-from datetime import datetime
-from collections import defaultdict, Counter
+import os
+
+from utils.aggregator import aggregate_transactions, heavy_hitters
+from utils.instrumentation import instrumented
+from utils.topn import SPACE_SAVING_CAPACITY, top_n, check_top_mode, space_saving_top
+from utils.report_formats import REPORT_FORMATS, REPORT_EXTENSIONS
+from utils.sketches import distinct_count
+
+
+# Section key, title and either table columns (header, field, cell template)
+# or labelled fields (label, field, template, text shown for an empty list)
+REPORT_LAYOUT = (
+    ("summary", "OVERALL SUMMARY", "fields", (
+        ("Total Revenue", "total_revenue", "₹{:,.2f}", ""),
+        ("Total Transactions", "total_transactions", "{}", ""),
+        ("Average Order Value", "avg_order_value", "₹{:,.2f}", ""),
+        ("Date Range", "date_range", "{}", "")
+    )),
+    ("regions", "REGION-WISE PERFORMANCE", "table", (
+        ("Region", "region", "{}"),
+        ("Sales", "sales", "₹{:,.0f}"),
+        ("% of Total", "percent", "{:.2f}%"),
+        ("Transactions", "transactions", "{}")
+    )),
+    ("top_products", "TOP 5 PRODUCTS", "table", (
+        ("Rank", "rank", "{}"),
+        ("Product", "product", "{}"),
+        ("Quantity", "quantity", "{}"),
+        ("Revenue", "revenue", "₹{:,.0f}")
+    )),
+    ("top_customers", "TOP 5 CUSTOMERS", "table", (
+        ("Rank", "rank", "{}"),
+        ("Customer", "customer", "{}"),
+        ("Total Spent", "total_spent", "₹{:,.0f}"),
+        ("Orders", "orders", "{}")
+    )),
+    ("daily_trend", "DAILY SALES TREND", "table", (
+        ("Date", "date", "{}"),
+        ("Revenue", "revenue", "₹{:,.0f}"),
+        ("Transactions", "transactions", "{}"),
+        ("Unique Customers", "unique_customers", "{}")
+    )),
+    ("product_performance", "PRODUCT PERFORMANCE ANALYSIS", "fields", (
+        ("Best Selling Day", "best_day", "{}", ""),
+        ("Low Performing Products", "low_products", "{}", "")
+    )),
+    ("enrichment", "API ENRICHMENT SUMMARY", "fields", (
+        ("Total Products Enriched", "enriched_count", "{}", ""),
+        ("Success Rate", "success_rate", "{:.2f}%", ""),
+        ("Products Not Enriched", "missing_products", "{}", "None")
+    ))
+)
+
+
+def _row_template(columns, separator):
+    """
+    Compiles table columns into one format string for a whole row,
+    e.g. '{region}\t₹{sales:,.0f}\t...'
+    """
+
+    return separator.join(
+        template.replace("{", "{" + field, 1) for _, field, template in columns
+    )
+
+
+# Row templates are compiled once at import, not per row
+TEXT_ROW_TEMPLATES = {
+    key: _row_template(spec, "\t")
+    for key, _, kind, spec in REPORT_LAYOUT if kind == "table"
+}
+
+
+def _field_text(value, template, empty):
+    if isinstance(value, list):
+        return ", ".join(value) or empty
+    return template.format(value)
 
 
-def generate_sales_report(transactions, enriched_transactions, output_file='output/sales_report.txt'):
+def build_report_sections(aggregates, enriched_transactions):
     """
-    Generates a comprehensive formatted text report
+    Computes every report section from precomputed aggregates
+
+    Empty aggregates (e.g. from a filter that matched nothing) give a
+    report with empty tables instead of an error.
+
+    Returns: dict of JSON-ready sections, shared by the text report and
+    the HTTP service (see utils.service)
     """
 
+    from datetime import datetime
+
     # =========================
     # HEADER
     # =========================
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    total_records = len(transactions)
+    total_records = aggregates["transaction_count"]
 
     # =========================
     # OVERALL SUMMARY
     # =========================
-    total_revenue = sum(t["Quantity"] * t["UnitPrice"] for t in transactions)
-    total_transactions = len(transactions)
+    total_revenue = aggregates["total_revenue"]
+    total_transactions = aggregates["transaction_count"]
     avg_order_value = total_revenue / total_transactions if total_transactions else 0
 
-    dates = sorted(t["Date"] for t in transactions)
-    if dates:
-        date_range = f"{dates[0]} to {dates[-1]}"
+    if total_transactions:
+        date_range = f"{aggregates['min_date']} to {aggregates['max_date']}"
     else:
         date_range = "N/A"
 
@@ -30,140 +111,301 @@ def generate_sales_report(transactions, enriched_transactions, output_file='outp
     # =========================
     # REGION-WISE PERFORMANCE
     # =========================
-    region_sales = defaultdict(float)
-    region_transactions = Counter()
-
-    for t in transactions:
-        revenue = t["Quantity"] * t["UnitPrice"]
-        region_sales[t["Region"]] += revenue
-        region_transactions[t["Region"]] += 1
-
     region_data = []
-    for region, sales in region_sales.items():
-        percent = (sales / total_revenue) * 100
-        region_data.append((region, sales, percent, region_transactions[region]))
-
-    region_data.sort(key=lambda x: x[1], reverse=True)
+    for region, data in aggregates["regions"].items():
+        sales = data["total_sales"]
+        percent = (sales / total_revenue) * 100 if total_revenue else 0
+        region_data.append({
+            "region": region,
+            "sales": sales,
+            "percent": percent,
+            "transactions": data["transaction_count"]
+        })
+
+    region_data.sort(key=lambda x: x["sales"], reverse=True)
 
     # =========================
     # TOP 5 PRODUCTS
     # =========================
-    product_qty = defaultdict(int)
-    product_revenue = defaultdict(float)
-
-    for t in transactions:
-        product_qty[t["ProductName"]] += t["Quantity"]
-        product_revenue[t["ProductName"]] += t["Quantity"] * t["UnitPrice"]
+    products = aggregates["products"]
 
-    top_products = sorted(
-        product_revenue.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:5]
+    top_products = top_n(
+        ((name, data["revenue"]) for name, data in products.items()),
+        5,
+        key=lambda x: x[1]
+    )
 
     # =========================
     # TOP 5 CUSTOMERS
     # =========================
-    customer_spend = defaultdict(float)
-    customer_orders = Counter()
+    customers = aggregates["customers"]
 
-    for t in transactions:
-        customer_spend[t["CustomerID"]] += t["Quantity"] * t["UnitPrice"]
-        customer_orders[t["CustomerID"]] += 1
-
-    top_customers = sorted(
-        customer_spend.items(),
-        key=lambda x: x[1],
-        reverse=True
-    )[:5]
+    top_customers = top_n(
+        ((cid, data["total_spent"]) for cid, data in customers.items()),
+        5,
+        key=lambda x: x[1]
+    )
 
     # =========================
     # DAILY SALES TREND
     # =========================
-    daily_revenue = defaultdict(float)
-    daily_transactions = Counter()
-    daily_customers = defaultdict(set)
-
-    for t in transactions:
-        date = t["Date"]
-        revenue = t["Quantity"] * t["UnitPrice"]
-        daily_revenue[date] += revenue
-        daily_transactions[date] += 1
-        daily_customers[date].add(t["CustomerID"])
+    daily = aggregates["daily"]
 
     # =========================
     # PRODUCT PERFORMANCE
     # =========================
-    best_day = max(daily_revenue.items(), key=lambda x: x[1])[0]
+    # A filter that matches nothing leaves every group empty
+    best_day = max(daily.items(), key=lambda x: x[1]["revenue"])[0] if daily else "N/A"
 
-    avg_product_revenue = sum(product_revenue.values()) / len(product_revenue)
-    low_products = [p for p, r in product_revenue.items() if r < avg_product_revenue]
+    if products:
+        avg_product_revenue = sum(data["revenue"] for data in products.values()) / len(products)
+        low_products = [p for p, data in products.items() if data["revenue"] < avg_product_revenue]
+    else:
+        low_products = []
 
     # =========================
     # API ENRICHMENT SUMMARY
     # =========================
     enriched_count = len(enriched_transactions)
-    sales_product_ids = set(t["ProductID"] for t in transactions)
+    sales_product_ids = aggregates["product_ids"]
     enriched_ids = set(enriched_transactions.keys())
 
     matched_products = sales_product_ids.intersection(enriched_ids)
 
     success_rate = (len(matched_products) / len(sales_product_ids)) * 100 if sales_product_ids else 0
 
+    missing_products = sorted(sales_product_ids - enriched_ids)
+
+    return {
+        "header": {
+            "generated": now,
+            "records_processed": total_records
+        },
+        "summary": {
+            "total_revenue": total_revenue,
+            "total_transactions": total_transactions,
+            "avg_order_value": avg_order_value,
+            "date_range": date_range
+        },
+        "regions": region_data,
+        "top_products": [
+            {"rank": i, "product": name, "quantity": products[name]["quantity"], "revenue": revenue}
+            for i, (name, revenue) in enumerate(top_products, 1)
+        ],
+        "top_customers": [
+            {"rank": i, "customer": cid, "total_spent": spent,
+             "orders": customers[cid]["purchase_count"]}
+            for i, (cid, spent) in enumerate(top_customers, 1)
+        ],
+        "daily_trend": [
+            {"date": d, "revenue": daily[d]["revenue"],
+             "transactions": daily[d]["transaction_count"],
+             "unique_customers": distinct_count(daily[d]["customers"])}
+            for d in sorted(daily)
+        ],
+        "product_performance": {
+            "best_day": best_day,
+            "low_products": low_products
+        },
+        "enrichment": {
+            "enriched_count": enriched_count,
+            "success_rate": success_rate,
+            "missing_products": missing_products
+        }
+    }
+
+
+def render_text(sections):
+    """
+    Renders the sections as the tab-separated text report
+    """
 
-    enriched_ids = set(enriched_transactions.keys())
-    missing_products = list(set(t["ProductID"] for t in transactions) - enriched_ids)
-
-    # =========================
-    # WRITE REPORT
-    # =========================
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write("SALES ANALYTICS REPORT\n")
-        f.write("=" * 50 + "\n")
-        f.write(f"Generated: {now}\n")
-        f.write(f"Records Processed: {total_records}\n\n")
-
-        f.write("OVERALL SUMMARY\n")
-        f.write("-" * 40 + "\n")
-        f.write(f"Total Revenue: ₹{total_revenue:,.2f}\n")
-        f.write(f"Total Transactions: {total_transactions}\n")
-        f.write(f"Average Order Value: ₹{avg_order_value:,.2f}\n")
-        f.write(f"Date Range: {date_range}\n\n")
-
-        f.write("REGION-WISE PERFORMANCE\n")
-        f.write("-" * 40 + "\n")
-        f.write("Region\tSales\t% of Total\tTransactions\n")
-        for r, s, p, c in region_data:
-            f.write(f"{r}\t₹{s:,.0f}\t{p:.2f}%\t{c}\n")
-
-        f.write("\nTOP 5 PRODUCTS\n")
-        f.write("-" * 40 + "\n")
-        f.write("Rank\tProduct\tQuantity\tRevenue\n")
-        for i, (pname, rev) in enumerate(top_products, 1):
-            f.write(f"{i}\t{pname}\t{product_qty[pname]}\t₹{rev:,.0f}\n")
-
-        f.write("\nTOP 5 CUSTOMERS\n")
-        f.write("-" * 40 + "\n")
-        f.write("Rank\tCustomer\tTotal Spent\tOrders\n")
-        for i, (cust, spent) in enumerate(top_customers, 1):
-            f.write(f"{i}\t{cust}\t₹{spent:,.0f}\t{customer_orders[cust]}\n")
-
-        f.write("\nDAILY SALES TREND\n")
-        f.write("-" * 40 + "\n")
-        f.write("Date\tRevenue\tTransactions\tUnique Customers\n")
-        for d in sorted(daily_revenue):
-            f.write(
-                f"{d}\t₹{daily_revenue[d]:,.0f}\t"
-                f"{daily_transactions[d]}\t{len(daily_customers[d])}\n"
+    header = sections["header"]
+    blocks = [[
+        "SALES ANALYTICS REPORT",
+        "=" * 50,
+        f"Generated: {header['generated']}",
+        f"Records Processed: {header['records_processed']}"
+    ]]
+
+    for key, title, kind, spec in REPORT_LAYOUT:
+        lines = [title, "-" * 40]
+        if kind == "table":
+            lines.append("\t".join(column[0] for column in spec))
+            lines.extend(map(TEXT_ROW_TEMPLATES[key].format_map, sections[key]))
+        else:
+            data = sections[key]
+            lines.extend(
+                f"{label}: {_field_text(data[field], template, empty)}"
+                for label, field, template, empty in spec
+            )
+        blocks.append(lines)
+
+    return "\n\n".join("\n".join(lines) for lines in blocks) + "\n"
+
+
+def render_csv(sections):
+    """
+    Renders the sections as CSV: one block per section (title row, header
+    row, data rows) with raw numbers, separated by empty rows
+    """
+
+    import csv
+    import io
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    header = sections["header"]
+
+    writer.writerows([
+        ["SALES ANALYTICS REPORT"],
+        ["Generated", header["generated"]],
+        ["Records Processed", header["records_processed"]]
+    ])
+
+    for key, title, kind, spec in REPORT_LAYOUT:
+        writer.writerow([])
+        writer.writerow([title])
+        if kind == "table":
+            fields = [column[1] for column in spec]
+            writer.writerow([column[0] for column in spec])
+            writer.writerows([row[field] for field in fields] for row in sections[key])
+        else:
+            data = sections[key]
+            writer.writerows(
+                [label, "; ".join(data[field]) if isinstance(data[field], list) else data[field]]
+                for label, field, _, _ in spec
             )
 
-        f.write("\nPRODUCT PERFORMANCE ANALYSIS\n")
-        f.write("-" * 40 + "\n")
-        f.write(f"Best Selling Day: {best_day}\n")
-        f.write(f"Low Performing Products: {', '.join(low_products)}\n\n")
+    return buffer.getvalue()
+
+
+def render_json(sections):
+    """
+    Renders the sections as a JSON document with raw numbers
+    """
+
+    import json
+
+    return json.dumps(sections, indent=2, ensure_ascii=False) + "\n"
+
+
+def render_html(sections):
+    """
+    Renders the sections as a standalone HTML page
+    """
+
+    import html
+
+    escape = html.escape
+    header = sections["header"]
+    parts = [
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        "<title>Sales Analytics Report</title>\n</head>\n<body>\n",
+        "<h1>Sales Analytics Report</h1>\n",
+        f"<p>Generated: {escape(header['generated'])}<br>"
+        f"Records Processed: {header['records_processed']}</p>\n"
+    ]
+
+    for key, title, kind, spec in REPORT_LAYOUT:
+        parts.append(f"<h2>{escape(title)}</h2>\n<table>\n")
+        if kind == "table":
+            parts.append(
+                "<tr>" + "".join(f"<th>{escape(column[0])}</th>" for column in spec) + "</tr>\n"
+            )
+            for row in sections[key]:
+                parts.append("<tr>" + "".join(
+                    f"<td>{escape(template.format(row[field]))}</td>" for _, field, template in spec
+                ) + "</tr>\n")
+        else:
+            data = sections[key]
+            for label, field, template, empty in spec:
+                value = _field_text(data[field], template, empty)
+                parts.append(f"<tr><th>{escape(label)}</th><td>{escape(value)}</td></tr>\n")
+        parts.append("</table>\n")
+
+    parts.append("</body>\n</html>\n")
+    return "".join(parts)
+
+
+RENDERERS = {
+    'text': render_text,
+    'csv': render_csv,
+    'json': render_json,
+    'html': render_html
+}
+
+
+def report_paths(output_file, formats):
+    """
+    Output file per format: the text report goes to output_file and the
+    others next to it with their own extension (sales_report.csv, ...)
+    """
+
+    base = os.path.splitext(output_file)[0]
+    paths = {}
+    for fmt in formats:
+        if fmt not in RENDERERS:
+            raise ValueError(f"Unknown report format: {fmt!r} (expected one of {REPORT_FORMATS})")
+        paths[fmt] = output_file if fmt == 'text' else base + REPORT_EXTENSIONS[fmt]
+    return paths
+
+
+def write_report(sections, output_file, fmt='text'):
+    """
+    Renders the sections in memory and writes them in a single call
+    """
+
+    content = RENDERERS[fmt](sections)
+    with open(output_file, "w", encoding="utf-8", newline="") as f:
+        f.write(content)
+
+
+@instrumented(rows=None)
+def generate_sales_report(transactions, enriched_transactions, output_file='output/sales_report.txt',
+                          aggregates=None, formats=('text',), mode='exact',
+                          capacity=SPACE_SAVING_CAPACITY, distinct='exact', error=0.01):
+    """
+    Generates a comprehensive formatted report
+
+    Every section is derived from a single aggregation pass; pass
+    precomputed aggregates (see utils.aggregator) to skip it entirely.
+    The sections are computed once and rendered to each requested format
+    ('text', 'csv', 'json', 'html'), see report_paths for file names.
+
+    mode='approx' (without aggregates) ranks customers with a Space-Saving
+    summary of `capacity` customers instead of grouping all of them;
+    the other groups are bounded by the catalog, regions and dates and
+    stay exact. transactions are then read twice, so pass a list or table.
+
+    distinct='hll' counts the unique customers per day with HyperLogLog
+    sketches (relative standard error `error`) instead of sets when the
+    aggregates are built here.
+
+    Returns: dict of format -> file written
+    """
 
-        f.write("API ENRICHMENT SUMMARY\n")
-        f.write("-" * 40 + "\n")
-        f.write(f"Total Products Enriched: {enriched_count}\n")
-        f.write(f"Success Rate: {success_rate:.2f}%\n")
-        f.write("Products Not Enriched: None (API IDs do not map directly to sales ProductIDs)\n")
\ No newline at end of file
+    if check_top_mode(mode) == 'approx' and aggregates is None:
+        aggregates = aggregate_transactions(
+            transactions, groups=('regions', 'products', 'daily'), distinct=distinct, error=error
+        )
+        state = heavy_hitters(transactions, 'customers', capacity)
+        aggregates["customers"] = {
+            cid: {
+                "total_spent": spent,
+                "purchase_count": state["totals"][cid]["purchase_count"],
+                "products": None
+            }
+            for cid, spent, _ in space_saving_top(state)
+        }
+
+    if aggregates is None:
+        aggregates = aggregate_transactions(transactions, distinct=distinct, error=error)
+
+    paths = report_paths(output_file, formats)
+    sections = build_report_sections(aggregates, enriched_transactions)
+
+    for fmt, path in paths.items():
+        write_report(sections, path, fmt)
+
+    return paths
@@ -0,0 +1,133 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+from utils.aggregator import aggregate_transactions
+from utils.sketches import distinct_copy, distinct_merge, distinct_count
+
+
+GRANULARITIES = ('daily', 'weekly', 'monthly')
+
+
+def bucket_key(day, granularity):
+    """
+    Maps an ISO date string to its bucket: the date itself, the Monday
+    starting its week, or its YYYY-MM month
+    """
+
+    if granularity == 'daily':
+        return day
+    if granularity == 'weekly':
+        d = date.fromisoformat(day)
+        return (d - timedelta(days=d.weekday())).isoformat()
+    if granularity == 'monthly':
+        return day[:7]
+    raise ValueError(f"Unknown granularity: {granularity!r}")
+
+
+def _build_table(daily, granularity):
+    buckets = {}
+
+    for day in sorted(daily):
+        data = daily[day]
+        key = bucket_key(day, granularity)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {
+                'revenue': 0.0,
+                'transaction_count': 0,
+                'customers': distinct_copy(data['customers'])
+            }
+        else:
+            distinct_merge(bucket['customers'], data['customers'])
+        bucket['revenue'] += data['revenue']
+        bucket['transaction_count'] += data['transaction_count']
+
+    keys = list(buckets)
+    revenue_prefix = [0.0]
+    count_prefix = [0]
+    for key in keys:
+        revenue_prefix.append(revenue_prefix[-1] + buckets[key]['revenue'])
+        count_prefix.append(count_prefix[-1] + buckets[key]['transaction_count'])
+
+    return {
+        'keys': keys,
+        'revenue': [buckets[key]['revenue'] for key in keys],
+        'transaction_count': [buckets[key]['transaction_count'] for key in keys],
+        'customers': [buckets[key]['customers'] for key in keys],
+        'revenue_prefix': revenue_prefix,
+        'count_prefix': count_prefix
+    }
+
+
+def build_rollups(transactions=None, aggregates=None, distinct='exact', error=0.01):
+    """
+    Precomputes daily, weekly and monthly rollup tables
+
+    Built from the daily group of precomputed aggregates when given, so
+    loading data and building rollups share one pass. distinct='hll'
+    keeps one fixed-size customer sketch per bucket (relative standard
+    error `error`) instead of a set.
+    """
+
+    if aggregates is None:
+        aggregates = aggregate_transactions(
+            transactions, groups=('daily',), distinct=distinct, error=error
+        )
+
+    daily = aggregates['daily']
+    return {granularity: _build_table(daily, granularity) for granularity in GRANULARITIES}
+
+
+def _bucket_range(table, start_date, end_date, granularity):
+    keys = table['keys']
+    lo = bisect_left(keys, bucket_key(start_date, granularity)) if start_date else 0
+    hi = bisect_right(keys, bucket_key(end_date, granularity)) if end_date else len(keys)
+    return lo, max(lo, hi)
+
+
+def range_summary(rollups, start_date=None, end_date=None, granularity='daily'):
+    """
+    Summarizes every bucket overlapping [start_date, end_date]
+
+    Revenue and transaction counts come from prefix sums in O(log n).
+    Distinct customers are the union of the per-bucket customer sets or
+    sketches, so coarser granularities answer long ranges with fewer merges.
+    """
+
+    table = rollups[granularity]
+    lo, hi = _bucket_range(table, start_date, end_date, granularity)
+
+    customers = None
+    for bucket in table['customers'][lo:hi]:
+        if customers is None:
+            customers = distinct_copy(bucket)
+        else:
+            distinct_merge(customers, bucket)
+
+    return {
+        'start': table['keys'][lo] if lo < hi else None,
+        'end': table['keys'][hi - 1] if lo < hi else None,
+        'buckets': hi - lo,
+        'revenue': table['revenue_prefix'][hi] - table['revenue_prefix'][lo],
+        'transaction_count': table['count_prefix'][hi] - table['count_prefix'][lo],
+        'unique_customers': distinct_count(customers) if customers is not None else 0
+    }
+
+
+def rollup_series(rollups, start_date=None, end_date=None, granularity='daily'):
+    """
+    Returns per-bucket rows for [start_date, end_date], in the same shape
+    as data_processor.daily_sales_trend
+    """
+
+    table = rollups[granularity]
+    lo, hi = _bucket_range(table, start_date, end_date, granularity)
+
+    return {
+        table['keys'][i]: {
+            'revenue': table['revenue'][i],
+            'transaction_count': table['transaction_count'][i],
+            'unique_customers': distinct_count(table['customers'][i])
+        }
+        for i in range(lo, hi)
+    }
@@ -0,0 +1,438 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+
+from utils.aggregator import new_aggregates, update_aggregates
+from utils.api_handler import fetch_all_products, create_product_mapping, lookup_products
+from utils.columnar import new_table, extend_table, iter_table_rows, take_rows
+from utils.data_processor import (
+    calculate_total_revenue, region_wise_sales, top_selling_products, customer_analysis,
+    daily_sales_trend, find_peak_sales_day, low_performing_products
+)
+from utils.dedup import new_deduper, dedup_table
+from utils.line_parser import iter_table_batches, is_valid_date
+from utils.query import build_index, query_rows
+from utils.report_generator import build_report_sections
+from utils.rollups import GRANULARITIES, build_rollups, range_summary, rollup_series
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+RESPONSE_CACHE_SIZE = 256
+MAX_ROWS = 1000
+MAX_HEADER_BYTES = 64 * 1024
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error"
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _file_signature(file_path):
+    """
+    (mtime, size) of the data file; changes whenever the file is rewritten
+    or appended to
+    """
+
+    st = os.stat(file_path)
+    return st.st_mtime_ns, st.st_size
+
+
+def load_dataset(file_path, product_map):
+    """
+    Reads, cleans and indexes a sales file once for repeated queries
+
+    Returns: dict with the columnar table, aggregates, query index,
+    rollups, enriched product info and the file signature it was built from
+    """
+
+    signature = _file_signature(file_path)
+    stats = {"duplicates": 0}
+    table = new_table()
+    aggregates = new_aggregates()
+    deduper = new_deduper()
+
+    for batch in iter_table_batches(file_path, stats=stats):
+        batch = dedup_table(deduper, batch, stats)
+        update_aggregates(aggregates, batch)
+        extend_table(table, batch)
+
+    product_info = lookup_products(sorted(aggregates["product_ids"]), product_map)
+
+    return {
+        "file": file_path,
+        "signature": signature,
+        "loaded_at": time.time(),
+        "stats": stats,
+        "table": table,
+        "aggregates": aggregates,
+        "index": build_index(table),
+        "rollups": build_rollups(aggregates=aggregates),
+        "enriched_products": {pid: info for pid, info in product_info.items() if info}
+    }
+
+
+def new_service(data_file, product_map=None, cache_size=RESPONSE_CACHE_SIZE):
+    """
+    Creates the service state; the dataset is loaded on the first request
+    (or by refresh_dataset)
+
+    product_map defaults to the (cached) API catalog, fetched once.
+    """
+
+    if product_map is None:
+        product_map = create_product_mapping(fetch_all_products())
+
+    return {
+        "data_file": data_file,
+        "product_map": product_map,
+        "dataset": None,
+        "cache": OrderedDict(),
+        "cache_size": cache_size,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "lock": None
+    }
+
+
+async def refresh_dataset(service):
+    """
+    Reloads the dataset if the data file changed since it was loaded,
+    clearing the response cache
+
+    The reload runs in a worker thread so the event loop stays free;
+    concurrent requests wait for the same reload instead of repeating it.
+    """
+
+    if service["lock"] is None:
+        service["lock"] = asyncio.Lock()
+
+    async with service["lock"]:
+        dataset = service["dataset"]
+        signature = _file_signature(service["data_file"])
+
+        if dataset is not None and dataset["signature"] == signature:
+            return dataset
+
+        loop = asyncio.get_running_loop()
+        dataset = await loop.run_in_executor(
+            None, load_dataset, service["data_file"], service["product_map"]
+        )
+
+        service["dataset"] = dataset
+        service["cache"].clear()
+        print(f"✓ Loaded {dataset['table']['row_count']} transactions from {service['data_file']}")
+        return dataset
+
+
+def _param(params, name, convert=str, default=None):
+    values = params.get(name)
+    if not values or values[-1] == "":
+        return default
+    try:
+        return convert(values[-1])
+    except ValueError:
+        raise BadRequest(f"Invalid value for {name!r}: {values[-1]!r}")
+
+
+def _date(value):
+    # A YYYY-MM-DD calendar date, like the Date column
+    if not is_valid_date(value):
+        raise ValueError(value)
+    return value
+
+
+def _count(value):
+    count = int(value)
+    if count < 0:
+        raise ValueError(value)
+    return count
+
+
+def _granularity(params):
+    granularity = _param(params, "granularity", default="daily")
+    if granularity not in GRANULARITIES:
+        raise BadRequest(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    return granularity
+
+
+def _summary(dataset, params):
+    aggregates = dataset["aggregates"]
+    stats = dataset["stats"]
+    return {
+        "file": dataset["file"],
+        "total_revenue": calculate_total_revenue(None, aggregates=aggregates),
+        "transaction_count": aggregates["transaction_count"],
+        "min_date": aggregates["min_date"],
+        "max_date": aggregates["max_date"],
+        "records_read": stats["total"],
+        "invalid": stats["invalid"],
+        "duplicates": stats["duplicates"]
+    }
+
+
+def _regions(dataset, params):
+    return region_wise_sales(None, aggregates=dataset["aggregates"])
+
+
+def _top_products(dataset, params):
+    n = _param(params, "n", _count, 5)
+    return [
+        {"product": name, "quantity": quantity, "revenue": revenue}
+        for name, quantity, revenue in top_selling_products(None, n=n, aggregates=dataset["aggregates"])
+    ]
+
+
+def _low_products(dataset, params):
+    threshold = _param(params, "threshold", int, 10)
+    return [
+        {"product": name, "quantity": quantity, "revenue": revenue}
+        for name, quantity, revenue in low_performing_products(
+            None, threshold=threshold, aggregates=dataset["aggregates"]
+        )
+    ]
+
+
+def _customers(dataset, params):
+    n = _param(params, "n", _count, 10)
+    return customer_analysis(None, aggregates=dataset["aggregates"], n=n)
+
+
+def _daily(dataset, params):
+    start_date = _param(params, "start", _date)
+    end_date = _param(params, "end", _date)
+    granularity = _granularity(params)
+
+    if start_date is None and end_date is None and granularity == "daily":
+        return daily_sales_trend(None, aggregates=dataset["aggregates"])
+    return rollup_series(dataset["rollups"], start_date, end_date, granularity)
+
+
+def _range(dataset, params):
+    return range_summary(
+        dataset["rollups"], _param(params, "start", _date), _param(params, "end", _date),
+        _granularity(params)
+    )
+
+
+def _peak(dataset, params):
+    date, revenue, count = find_peak_sales_day(None, aggregates=dataset["aggregates"])
+    return {"date": date, "revenue": revenue, "transaction_count": count}
+
+
+def _transactions(dataset, params):
+    rows = query_rows(
+        dataset["index"],
+        region=_param(params, "region"),
+        start_date=_param(params, "start", _date),
+        end_date=_param(params, "end", _date),
+        min_amount=_param(params, "min_amount", float),
+        max_amount=_param(params, "max_amount", float),
+        customer_id=_param(params, "customer"),
+        product_id=_param(params, "product")
+    )
+
+    limit = min(max(_param(params, "limit", int, 100), 0), MAX_ROWS)
+    amounts = dataset["index"]["amounts"]
+    page = rows[:limit]
+
+    return {
+        "matched": len(rows),
+        "revenue": sum(amounts[row] for row in rows),
+        "rows": list(iter_table_rows(take_rows(dataset["table"], page)))
+    }
+
+
+def _report(dataset, params):
+    return build_report_sections(dataset["aggregates"], dataset["enriched_products"])
+
+
+ENDPOINTS = {
+    "/summary": _summary,
+    "/regions": _regions,
+    "/products/top": _top_products,
+    "/products/low": _low_products,
+    "/customers": _customers,
+    "/daily": _daily,
+    "/range": _range,
+    "/peak": _peak,
+    "/transactions": _transactions,
+    "/report": _report
+}
+
+
+def _json_response(status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return status, body
+
+
+async def handle_request(service, method, target):
+    """
+    Answers one request
+
+    Returns: (status code, JSON body bytes)
+    """
+
+    if method != "GET":
+        return _json_response(405, {"error": "Only GET is supported"})
+
+    url = urlsplit(target)
+    path = url.path.rstrip("/") or "/"
+
+    if path == "/":
+        return _json_response(200, {"endpoints": sorted(ENDPOINTS) + ["/health"]})
+
+    if path == "/health":
+        dataset = service["dataset"]
+        return _json_response(200, {
+            "loaded": dataset is not None,
+            "rows": dataset["table"]["row_count"] if dataset else 0,
+            "cached_responses": len(service["cache"]),
+            "cache_hits": service["cache_hits"],
+            "cache_misses": service["cache_misses"]
+        })
+
+    endpoint = ENDPOINTS.get(path)
+    if endpoint is None:
+        return _json_response(404, {"error": f"Unknown endpoint: {path}"})
+
+    dataset = await refresh_dataset(service)
+
+    # Parameters are sorted so equivalent query strings share an entry
+    params = parse_qs(url.query)
+    key = (path, tuple(sorted((name, tuple(values)) for name, values in params.items())))
+    cache = service["cache"]
+
+    if key in cache:
+        cache.move_to_end(key)
+        service["cache_hits"] += 1
+        return cache[key]
+
+    try:
+        response = _json_response(200, endpoint(dataset, params))
+    except BadRequest as e:
+        return _json_response(400, {"error": str(e)})
+
+    service["cache_misses"] += 1
+    cache[key] = response
+    while len(cache) > service["cache_size"]:
+        cache.popitem(last=False)
+
+    return response
+
+
+async def _read_request(reader):
+    """
+    Reads a request line and headers (bodies are not used)
+
+    Returns: (method, target, headers), or None when the client is done
+    """
+
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise BadRequest("Request headers too large")
+
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split()
+    if len(parts) != 3:
+        raise BadRequest("Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length") or 0)
+    if length:
+        await reader.readexactly(length)
+
+    return parts[0], parts[1], headers
+
+
+def _write_response(writer, status, body, keep_alive):
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+
+
+async def _serve_connection(service, reader, writer):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader)
+            except (BadRequest, ValueError) as e:
+                _write_response(writer, *_json_response(400, {"error": str(e)}), False)
+                break
+
+            if request is None:
+                break
+
+            method, target, headers = request
+            keep_alive = headers.get("connection", "").lower() != "close"
+
+            try:
+                status, body = await handle_request(service, method, target)
+            except Exception as e:
+                print("❌ Request failed:", target)
+                print("Error:", e)
+                status, body = _json_response(500, {"error": str(e)})
+
+            _write_response(writer, status, body, keep_alive)
+            await writer.drain()
+
+            if not keep_alive:
+                break
+
+    except ConnectionError:
+        pass
+
+    finally:
+        writer.close()
+
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Loads the dataset and answers HTTP requests until cancelled
+    """
+
+    await refresh_dataset(service)
+
+    server = await asyncio.start_server(
+        lambda reader, writer: _serve_connection(service, reader, writer),
+        host, port, limit=MAX_HEADER_BYTES
+    )
+
+    print(f"✓ Serving on http://{host}:{port}/")
+    async with server:
+        await server.serve_forever()
+
+
+def run_service(data_file, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Runs the analytics service in the foreground (Ctrl+C to stop)
+    """
+
+    service = new_service(data_file)
+    try:
+        asyncio.run(serve(service, host, port))
+    except KeyboardInterrupt:
+        print("\nService stopped")
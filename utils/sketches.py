@@ -0,0 +1,208 @@
+import base64
+import hashlib
+import math
+
+
+HLL_MIN_PRECISION = 4
+HLL_MAX_PRECISION = 18
+# A sparse register costs ~64 bytes (dict slot plus int key) against one
+# byte per dense register, so sparse sketches switch to dense once more
+# than 1/128 of the registers are set, keeping them at most about half
+# the size of the dense array
+HLL_SPARSE_DIVISOR = 128
+
+
+def hll_precision(error):
+    """
+    Smallest precision p whose standard error 1.04 / sqrt(2**p) is <= error
+    """
+
+    p = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(max(p, HLL_MIN_PRECISION), HLL_MAX_PRECISION)
+
+
+def hll_new(error=0.01):
+    """
+    Creates an empty HyperLogLog sketch for approximate distinct counts
+
+    Registers start sparse ({index: rank}) so the many small sketches of
+    per-customer / per-day groups stay tiny; well before they would
+    outgrow the dense form (see HLL_SPARSE_DIVISOR) they switch to a dense bytearray of 2**p
+    bytes (16 KB for the default 1% error), which stays fixed however
+    many values are added.
+    """
+
+    return {
+        'p': hll_precision(error),
+        'registers': {}
+    }
+
+
+def _densify(sketch):
+    registers = sketch['registers']
+    if isinstance(registers, dict) and len(registers) > (1 << sketch['p']) // HLL_SPARSE_DIVISOR:
+        dense = bytearray(1 << sketch['p'])
+        for index, rank in registers.items():
+            dense[index] = rank
+        sketch['registers'] = dense
+
+
+def hash64(value):
+    """
+    Stable 64-bit hash of a value's string form
+
+    Unlike hash(), it is the same in every process and run, so sketches
+    (and anything else keyed by it) can be merged and persisted.
+    """
+
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def hll_add(sketch, value):
+    p = sketch['p']
+    h = hash64(value)
+    index = h >> (64 - p)
+    rest = h & ((1 << (64 - p)) - 1)
+    rank = (64 - p) - rest.bit_length() + 1
+
+    registers = sketch['registers']
+    if isinstance(registers, dict):
+        if rank > registers.get(index, 0):
+            registers[index] = rank
+            _densify(sketch)
+    elif rank > registers[index]:
+        registers[index] = rank
+
+
+def hll_count(sketch):
+    """
+    Estimated number of distinct values added
+    """
+
+    registers = sketch['registers']
+    m = 1 << sketch['p']
+    alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+
+    if isinstance(registers, dict):
+        zeros = m - len(registers)
+        total = zeros + sum(2.0 ** -r for r in registers.values())
+    else:
+        zeros = registers.count(0)
+        total = sum(2.0 ** -r for r in registers)
+
+    estimate = alpha * m * m / total
+
+    if estimate <= 2.5 * m and zeros:
+        # Small-range correction: linear counting is more accurate here
+        estimate = m * math.log(m / zeros)
+
+    return round(estimate)
+
+
+def hll_merge(target, other):
+    """
+    Merges other into target (the union of both value sets)
+    """
+
+    if target['p'] != other['p']:
+        raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+
+    registers = target['registers']
+    other_registers = other['registers']
+
+    if isinstance(other_registers, dict):
+        if isinstance(registers, dict):
+            for index, rank in other_registers.items():
+                if rank > registers.get(index, 0):
+                    registers[index] = rank
+            _densify(target)
+        else:
+            for index, rank in other_registers.items():
+                if rank > registers[index]:
+                    registers[index] = rank
+    else:
+        dense = bytearray(other_registers)
+        if isinstance(registers, dict):
+            for index, rank in registers.items():
+                if rank > dense[index]:
+                    dense[index] = rank
+        else:
+            dense = bytearray(map(max, registers, dense))
+        target['registers'] = dense
+
+    return target
+
+
+def new_distinct(mode='exact', error=0.01):
+    """
+    Creates a distinct-value tracker: an exact set, or an HLL sketch
+    when mode is 'hll'
+    """
+
+    if mode == 'exact':
+        return set()
+    if mode == 'hll':
+        return hll_new(error)
+    raise ValueError(f"Unknown distinct mode: {mode!r} (expected 'exact' or 'hll')")
+
+
+def distinct_update(tracker, values):
+    if isinstance(tracker, set):
+        tracker.update(values)
+    else:
+        for value in values:
+            hll_add(tracker, value)
+
+
+def distinct_merge(target, other):
+    if isinstance(target, set):
+        target.update(other)
+    else:
+        hll_merge(target, other)
+    return target
+
+
+def distinct_count(tracker):
+    # Counts already computed elsewhere (e.g. by SQL) pass through
+    if isinstance(tracker, int):
+        return tracker
+    if isinstance(tracker, set):
+        return len(tracker)
+    return hll_count(tracker)
+
+
+def distinct_copy(tracker):
+    if isinstance(tracker, set):
+        return set(tracker)
+    registers = tracker['registers']
+    if isinstance(registers, dict):
+        return {'p': tracker['p'], 'registers': dict(registers)}
+    return {'p': tracker['p'], 'registers': bytearray(registers)}
+
+
+def distinct_to_json(tracker):
+    if isinstance(tracker, set):
+        return sorted(tracker)
+    registers = tracker['registers']
+    if isinstance(registers, dict):
+        # JSON object keys must be strings
+        return {'p': tracker['p'], 'sparse': {str(i): r for i, r in registers.items()}}
+    return {
+        'p': tracker['p'],
+        'registers': base64.b64encode(bytes(registers)).decode('ascii')
+    }
+
+
+def distinct_from_json(data):
+    if isinstance(data, list):
+        return set(data)
+    if 'sparse' in data:
+        # Saved before the sparse limit was lowered, a sketch can be past it
+        sketch = {'p': data['p'], 'registers': {int(i): r for i, r in data['sparse'].items()}}
+        _densify(sketch)
+        return sketch
+    return {
+        'p': data['p'],
+        'registers': bytearray(base64.b64decode(data['registers']))
+    }
@@ -0,0 +1,235 @@
+import sqlite3
+
+from utils.aggregator import ALL_GROUPS, new_aggregates
+from utils.columnar import is_table
+from utils.line_parser import iter_table_batches
+
+
+LOAD_BATCH_SIZE = 10000
+AMOUNT = "quantity * unit_price"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    unit_price REAL NOT NULL,
+    customer_id TEXT NOT NULL,
+    region TEXT NOT NULL
+)
+"""
+
+INDEXES = {
+    "idx_transactions_region": "region",
+    "idx_transactions_date": "date",
+    "idx_transactions_product": "product_id",
+    "idx_transactions_customer": "customer_id"
+}
+
+INSERT_SQL = "INSERT OR IGNORE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def open_store(db_file):
+    """
+    Opens (creating if needed) a SQLite transaction store
+
+    WAL mode lets readers query while a load is running, and
+    synchronous=NORMAL is durable enough for a rebuildable store.
+    """
+
+    connection = sqlite3.connect(db_file)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.execute(SCHEMA)
+    return connection
+
+
+def create_indexes(connection):
+    """
+    Creates the Region/Date/ProductID/CustomerID indexes if missing
+
+    load_records and load_file call this once after inserting, so a first
+    bulk load fills an unindexed table and each index is built once in
+    sorted order.
+    """
+
+    with connection:
+        for name, column in INDEXES.items():
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON transactions ({column})")
+
+
+def _table_rows(table):
+    columns = table["columns"]
+
+    def decoded(name):
+        column = columns[name]
+        return map(column["values"].__getitem__, column["codes"])
+
+    return zip(
+        columns["TransactionID"], decoded("Date"), decoded("ProductID"), decoded("ProductName"),
+        columns["Quantity"], columns["UnitPrice"], decoded("CustomerID"), decoded("Region")
+    )
+
+
+def _record_rows(records):
+    for t in records:
+        yield (
+            t["TransactionID"], t["Date"], t["ProductID"], t["ProductName"],
+            t["Quantity"], t["UnitPrice"], t["CustomerID"], t["Region"]
+        )
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_records(connection, transactions, batch_size=LOAD_BATCH_SIZE, index=True):
+    """
+    Bulk-inserts validated records (e.g. from clean_and_validate_data)
+    or a columnar table
+
+    Rows go in with executemany, one transaction per batch. A
+    TransactionID already in the store is skipped, so re-loading a file
+    is harmless. With index=False the indexes are left for the caller
+    to create once all rows are in.
+
+    Returns: number of rows inserted
+    """
+
+    rows = _table_rows(transactions) if is_table(transactions) else _record_rows(transactions)
+    before = connection.total_changes
+
+    for batch in _batched(rows, batch_size):
+        with connection:
+            connection.executemany(INSERT_SQL, batch)
+
+    inserted = connection.total_changes - before
+    if index:
+        create_indexes(connection)
+    return inserted
+
+
+def load_file(connection, file_path, stats=None, batch_size=LOAD_BATCH_SIZE):
+    """
+    Streams a sales file (or glob, see line_parser.iter_table_batches)
+    into the store without holding it in memory
+
+    Returns: number of rows inserted
+    """
+
+    inserted = 0
+    for table in iter_table_batches(file_path, stats=stats):
+        inserted += load_records(connection, table, batch_size, index=False)
+    create_indexes(connection)
+    return inserted
+
+
+def _where(region=None, start_date=None, end_date=None, min_amount=None, max_amount=None):
+    """
+    WHERE clause and parameters for the query.query_rows style filters
+    """
+
+    conditions = []
+    params = []
+
+    for condition, value in (
+        ("region = ?", region),
+        ("date >= ?", start_date),
+        ("date <= ?", end_date),
+        (f"{AMOUNT} >= ?", min_amount),
+        (f"{AMOUNT} <= ?", max_amount)
+    ):
+        if value is not None:
+            conditions.append(condition)
+            params.append(value)
+
+    clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return clause, params
+
+
+def sql_aggregates(connection, groups=ALL_GROUPS, top_customers=None, **filters):
+    """
+    Computes the aggregate state (see utils.aggregator) with SQL group-bys
+
+    The result can be passed as aggregates= to every data_processor
+    analytic and to generate_sales_report, so they report on the store
+    without loading it into memory. Groups keep first-inserted order,
+    matching an in-memory pass over the same rows. filters are region,
+    start_date, end_date, min_amount and max_amount.
+
+    Unique products per customer and customers per day are counted by
+    SQLite (COUNT(DISTINCT)), so they come back as plain numbers rather
+    than sets: the state can be reported on but not merged or rolled up.
+    With top_customers=n only the n biggest spenders are fetched.
+    """
+
+    aggregates = new_aggregates(groups)
+    where, params = _where(**filters)
+
+    def query(sql, *extra):
+        return connection.execute(sql, params + list(extra))
+
+    count, total, min_amount, max_amount, min_date, max_date = query(
+        f"SELECT COUNT(*), TOTAL({AMOUNT}), MIN({AMOUNT}), MAX({AMOUNT}), MIN(date), MAX(date)"
+        f" FROM transactions{where}"
+    ).fetchone()
+
+    aggregates['transaction_count'] = count
+    aggregates['total_revenue'] = total
+    aggregates['min_amount'] = min_amount
+    aggregates['max_amount'] = max_amount
+    aggregates['min_date'] = min_date
+    aggregates['max_date'] = max_date
+    aggregates['product_ids'].update(
+        row[0] for row in query(f"SELECT DISTINCT product_id FROM transactions{where}")
+    )
+
+    if 'regions' in aggregates:
+        for region, sales, n in query(
+            f"SELECT region, TOTAL({AMOUNT}), COUNT(*) FROM transactions{where}"
+            " GROUP BY region ORDER BY MIN(rowid)"
+        ):
+            aggregates['regions'][region] = {'total_sales': sales, 'transaction_count': n}
+
+    if 'products' in aggregates:
+        for name, quantity, revenue in query(
+            f"SELECT product_name, SUM(quantity), TOTAL({AMOUNT}) FROM transactions{where}"
+            " GROUP BY product_name ORDER BY MIN(rowid)"
+        ):
+            aggregates['products'][name] = {'quantity': quantity, 'revenue': revenue}
+
+    if 'customers' in aggregates:
+        sql = (
+            f"SELECT customer_id, TOTAL({AMOUNT}) AS spent, COUNT(*), COUNT(DISTINCT product_name),"
+            f" MIN(rowid) AS first FROM transactions{where} GROUP BY customer_id"
+        )
+        extra = ()
+        if top_customers is not None:
+            # Ties go to the customer seen first, as in utils.topn.top_n
+            sql = f"SELECT * FROM ({sql} ORDER BY spent DESC, first LIMIT ?)"
+            extra = (top_customers,)
+
+        for cid, spent, n, products, first in query(sql + " ORDER BY first", *extra):
+            aggregates['customers'][cid] = {
+                'total_spent': spent, 'purchase_count': n, 'products': products
+            }
+
+    if 'daily' in aggregates:
+        for date, revenue, n, customers in query(
+            f"SELECT date, TOTAL({AMOUNT}), COUNT(*), COUNT(DISTINCT customer_id)"
+            f" FROM transactions{where} GROUP BY date ORDER BY MIN(rowid)"
+        ):
+            aggregates['daily'][date] = {
+                'revenue': revenue, 'transaction_count': n, 'customers': customers
+            }
+
+    return aggregates
@@ -0,0 +1,130 @@
+import heapq
+
+
+TOP_MODES = ('exact', 'approx')
+SPACE_SAVING_CAPACITY = 1000
+
+
+def check_top_mode(mode):
+    """
+    Validates a top-N mode: 'exact' (full group-by plus heap selection)
+    or 'approx' (Space-Saving heavy hitters over the stream)
+    """
+
+    if mode not in TOP_MODES:
+        raise ValueError(f"Unknown top-N mode: {mode!r} (expected 'exact' or 'approx')")
+    return mode
+
+
+def top_n(items, n, key=None):
+    """
+    Returns the n largest items, same as sorted(items, key=key, reverse=True)[:n]
+    (ties keep their original order), in O(len * log n) instead of a full sort
+    """
+
+    if n is None:
+        return sorted(items, key=key, reverse=True)
+    if n < 0:
+        return sorted(items, key=key, reverse=True)[:n]
+    return heapq.nlargest(n, items, key=key)
+
+
+def bottom_n(items, n, key=None):
+    """
+    Returns the n smallest items, same as sorted(items, key=key)[:n]
+    """
+
+    if n is None:
+        return sorted(items, key=key)
+    if n < 0:
+        return sorted(items, key=key)[:n]
+    return heapq.nsmallest(n, items, key=key)
+
+
+def space_saving_new(capacity=SPACE_SAVING_CAPACITY):
+    """
+    Creates a Space-Saving heavy-hitters summary tracking at most
+    `capacity` keys
+
+    Any key whose true total exceeds (total weight / capacity) is
+    guaranteed to be tracked; each count overestimates its true total by
+    at most the recorded error. Side totals (see space_saving_add) only
+    cover the time a key has been tracked, so they are exact when its
+    error is 0.
+    """
+
+    return {
+        'capacity': capacity,
+        'counts': {},
+        'errors': {},
+        'totals': {},
+        'heap': []  # (count, key) with stale entries skipped lazily
+    }
+
+
+def _add_totals(state, key, totals):
+    if totals:
+        entry = state['totals'].setdefault(key, {})
+        for name, value in totals.items():
+            entry[name] = entry.get(name, 0) + value
+
+
+def space_saving_add(state, key, weight=1, totals=None):
+    """
+    Adds weight to key, evicting the smallest tracked key if full
+
+    totals (optional dict of name -> number) are summed per tracked key
+    alongside the ranking weight, e.g. revenue next to quantity.
+    """
+
+    counts = state['counts']
+
+    if key in counts:
+        counts[key] += weight
+        _add_totals(state, key, totals)
+        return
+
+    if len(counts) < state['capacity']:
+        counts[key] = weight
+        state['errors'][key] = 0
+        heapq.heappush(state['heap'], (weight, key))
+        _add_totals(state, key, totals)
+        return
+
+    heap = state['heap']
+    while True:
+        count, victim = heapq.heappop(heap)
+        if counts.get(victim) == count:
+            break
+        if victim in counts:
+            # Entry is stale: re-queue with the current count
+            heapq.heappush(heap, (counts[victim], victim))
+
+    del counts[victim]
+    del state['errors'][victim]
+    state['totals'].pop(victim, None)
+
+    counts[key] = count + weight
+    state['errors'][key] = count
+    heapq.heappush(heap, (count + weight, key))
+    _add_totals(state, key, totals)
+
+
+def space_saving_update(state, items):
+    """
+    Adds an iterable of (key, weight) or (key, weight, totals) items,
+    e.g. streamed transactions
+    """
+
+    for item in items:
+        space_saving_add(state, *item)
+    return state
+
+
+def space_saving_top(state, n=None):
+    """
+    Returns the estimated top n as (key, estimated_count, max_error) tuples
+    """
+
+    entries = [(key, count, state['errors'][key]) for key, count in state['counts'].items()]
+    return top_n(entries, n, key=lambda entry: entry[1])
@@ -0,0 +1,165 @@
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed for backend='numpy'
+    np = None
+
+
+def require_numpy():
+    """
+    Raises a helpful error if NumPy is not installed
+    """
+
+    if np is None:
+        raise ImportError("The 'numpy' backend requires NumPy (pip install numpy)")
+
+
+def _column(values, dtype):
+    # array.array exposes the buffer protocol, so this is zero-copy
+    return np.frombuffer(values, dtype=dtype) if len(values) else np.zeros(0, dtype=dtype)
+
+
+def _amounts(table):
+    columns = table['columns']
+    quantities = _column(columns['Quantity'], np.int64)
+    prices = _column(columns['UnitPrice'], np.float64)
+    return quantities, quantities * prices
+
+
+def _group_sum(codes, weights, size):
+    # bincount adds weights in row order, matching the pure-Python loops
+    return np.bincount(codes, weights=weights, minlength=size)
+
+
+def _total(amounts):
+    if not len(amounts):
+        return 0.0
+
+    zeros = np.zeros(len(amounts), dtype=np.intp)
+    return float(_group_sum(zeros, amounts, 1)[0])
+
+
+def _top_order(values, n):
+    """
+    Indices of the n largest values, ties broken by lowest index,
+    exactly like sorted(..., reverse=True)[:n] on first-seen order
+    (n=None keeps every value, a negative n drops the smallest, as in
+    utils.topn.top_n)
+    """
+
+    size = len(values)
+
+    if n is not None and 0 < n < size:
+        kth = np.partition(values, size - n)[size - n]
+        candidates = np.nonzero(values >= kth)[0]
+        order = candidates[np.argsort(-values[candidates], kind='stable')]
+        return order[:n]
+
+    return np.argsort(-values, kind='stable')[:n]
+
+
+def calculate_total_revenue(table):
+    """
+    Vectorized calculate_total_revenue over a columnar table
+    """
+
+    require_numpy()
+    _, amounts = _amounts(table)
+
+    return _total(amounts)
+
+
+def region_wise_sales(table):
+    """
+    Vectorized region_wise_sales over a columnar table
+    """
+
+    require_numpy()
+    region_col = table['columns']['Region']
+    codes = _column(region_col['codes'], np.uint32)
+    size = len(region_col['values'])
+
+    _, amounts = _amounts(table)
+    sales = _group_sum(codes, amounts, size)
+    counts = np.bincount(codes, minlength=size)
+    overall_sales = _total(amounts)
+
+    result = {}
+    for code in np.argsort(-sales, kind='stable'):
+        total_sales = float(sales[code])
+        result[region_col['values'][code]] = {
+            'total_sales': total_sales,
+            'transaction_count': int(counts[code]),
+            'percentage': round((total_sales / overall_sales) * 100, 2)
+        }
+
+    return result
+
+
+def _product_totals(table):
+    product_col = table['columns']['ProductName']
+    codes = _column(product_col['codes'], np.uint32)
+    size = len(product_col['values'])
+
+    quantities, amounts = _amounts(table)
+    # Float accumulation of integer quantities is exact below 2**53
+    qty = _group_sum(codes, quantities, size).astype(np.int64)
+    revenue = _group_sum(codes, amounts, size)
+
+    return product_col['values'], qty, revenue
+
+
+def top_selling_products(table, n=5):
+    """
+    Vectorized top_selling_products over a columnar table
+    """
+
+    require_numpy()
+    names, qty, revenue = _product_totals(table)
+
+    return [
+        (names[code], int(qty[code]), float(revenue[code]))
+        for code in _top_order(qty, n)
+    ]
+
+
+def low_performing_products(table, threshold=10):
+    """
+    Vectorized low_performing_products over a columnar table
+    """
+
+    require_numpy()
+    names, qty, revenue = _product_totals(table)
+
+    candidates = np.nonzero(qty < threshold)[0]
+    order = candidates[np.argsort(qty[candidates], kind='stable')]
+
+    return [
+        (names[code], int(qty[code]), float(revenue[code]))
+        for code in order
+    ]
+
+
+def find_peak_sales_day(table):
+    """
+    Vectorized find_peak_sales_day over a columnar table
+    """
+
+    require_numpy()
+    date_col = table['columns']['Date']
+    codes = _column(date_col['codes'], np.uint32)
+    dates = date_col['values']
+
+    _, amounts = _amounts(table)
+    revenue = _group_sum(codes, amounts, len(dates))
+    counts = np.bincount(codes, minlength=len(dates))
+
+    # Earliest date wins ties, as in the date-sorted Python scan
+    by_date = np.array(sorted(range(len(dates)), key=dates.__getitem__), dtype=np.intp)
+    if not len(by_date):
+        return (None, 0.0, 0)
+
+    best = by_date[np.argmax(revenue[by_date])]
+    if revenue[best] <= 0.0:
+        return (None, 0.0, 0)
+
+    return (dates[best], float(revenue[best]), int(counts[best]))